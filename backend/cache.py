@@ -1,47 +1,183 @@
 # backend/cache.py
 import hashlib
 import time
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from dataclasses import dataclass
 import threading
 
+try:
+    import xxhash
+except ImportError:  # Fall back to stdlib BLAKE2 (still much faster than MD5)
+    xxhash = None
 
 @dataclass
 class CacheEntry:
     """Cache entry with data and timestamp"""
     data: Any
-    timestamp: float
+    timestamp: float  # time.monotonic() at insert
     image_hash: str
 
 
+class _LRUShard:
+    """
+    Fixed-capacity LRU shard backed by preallocated slot arrays.
+
+    Entries live in a list of `capacity` slots; recency is a doubly linked
+    list threaded through the `prev`/`next` index arrays (head = least
+    recently used). Once full, inserts recycle the LRU slot in place, so the
+    steady state does no list growth or reallocation.
+
+    Mutating methods must be called with `lock` held.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Drop all entries by swapping in fresh arrays"""
+        self.entries: List[Optional[CacheEntry]] = [None] * self.capacity
+        self.key_to_slot: Dict[str, int] = {}
+        self.prev = [-1] * self.capacity
+        self.next = [-1] * self.capacity
+        self.head = -1
+        self.tail = -1
+        self.free = list(range(self.capacity - 1, -1, -1))
+
+    def lookup(self, key: str) -> Optional[CacheEntry]:
+        """Lock-free read; returns None on miss or a slot recycled mid-read"""
+        slot = self.key_to_slot.get(key)
+        if slot is None:
+            return None
+        entry = self.entries[slot]
+        if entry is None or entry.image_hash != key:
+            return None
+        return entry
+
+    def _unlink(self, slot: int):
+        prev_slot, next_slot = self.prev[slot], self.next[slot]
+        if prev_slot != -1:
+            self.next[prev_slot] = next_slot
+        else:
+            self.head = next_slot
+        if next_slot != -1:
+            self.prev[next_slot] = prev_slot
+        else:
+            self.tail = prev_slot
+
+    def _append(self, slot: int):
+        self.prev[slot] = self.tail
+        self.next[slot] = -1
+        if self.tail != -1:
+            self.next[self.tail] = slot
+        else:
+            self.head = slot
+        self.tail = slot
+
+    def touch(self, key: str):
+        """Mark key as most recently used"""
+        slot = self.key_to_slot.get(key)
+        if slot is not None and slot != self.tail:
+            self._unlink(slot)
+            self._append(slot)
+
+    def evict_lru(self) -> int:
+        """Evict least recently used entry and return its (now unlinked) slot"""
+        slot = self.head
+        self._unlink(slot)
+        del self.key_to_slot[self.entries[slot].image_hash]
+        self.entries[slot] = None
+        return slot
+
+    def insert(self, key: str, entry: CacheEntry):
+        """Store entry as most recently used, recycling the LRU slot if full"""
+        slot = self.key_to_slot.get(key)
+        if slot is not None:
+            self.entries[slot] = entry
+            self.touch(key)
+            return
+
+        slot = self.free.pop() if self.free else self.evict_lru()
+        self.entries[slot] = entry
+        self.key_to_slot[key] = slot
+        self._append(slot)
+
+    def remove(self, key: str, entry: CacheEntry):
+        """Remove key, but only if it still maps to this exact entry"""
+        slot = self.key_to_slot.get(key)
+        if slot is None or self.entries[slot] is not entry:
+            return
+        self._unlink(slot)
+        del self.key_to_slot[key]
+        self.entries[slot] = None
+        self.free.append(slot)
+
+    def oldest(self) -> Optional[CacheEntry]:
+        """Least recently used entry, or None if empty"""
+        return self.entries[self.head] if self.head != -1 else None
+
+    def values(self):
+        """Iterate entries from least to most recently used"""
+        slot = self.head
+        while slot != -1:
+            yield self.entries[slot]
+            slot = self.next[slot]
+
+    def __len__(self) -> int:
+        return len(self.key_to_slot)
+
+
 class SegmentationCache:
-    """Thread-safe LRU cache for segmentation results"""
+    """
+    Thread-safe LRU cache for segmentation results.
 
-    def __init__(self, max_size: int = 100, ttl_seconds: int = 300):
+    Entries are spread over independent fixed-capacity shards, each guarded
+    by its own lock, so concurrent requests only contend when their keys
+    land in the same shard. LRU eviction is per shard.
+
+    Reads are lock-free: lookups and TTL checks run without taking the
+    shard mutex, and recency is only bumped when the lock is free. LRU order
+    is therefore approximate under contention. Writes, eviction and clearing
+    are serialized per shard.
+    """
+
+    def __init__(self, max_size: int = 100, ttl_seconds: int = 300, num_shards: int = 16):
         """
         Args:
             max_size: Maximum number of entries to cache
             ttl_seconds: Time-to-live in seconds (default 5 minutes)
+            num_shards: Number of independently locked shards
         """
-        self.max_size = max_size
         self.ttl_seconds = ttl_seconds
-        self._cache: Dict[str, CacheEntry] = {}
-        self._lock = threading.Lock()
-        self._access_order = []  # Track access order for LRU
+        self.num_shards = max(1, min(num_shards, max_size))
+        # Capacity is split as evenly as possible, the remainder going one
+        # slot each to the first shards, so the total is exactly max_size
+        base, extra = divmod(max(max_size, self.num_shards), self.num_shards)
+        self._shards = [
+            _LRUShard(base + (1 if i < extra else 0)) for i in range(self.num_shards)
+        ]
+        self.max_size = sum(shard.capacity for shard in self._shards)
 
     def _compute_hash(self, image_bytes: bytes) -> str:
-        """Compute hash of image bytes for cache key"""
-        return hashlib.md5(image_bytes).hexdigest()
+        """
+        Compute hash of image bytes for cache key (128-bit hex digest)
+
+        The whole upload is hashed: xxh3 runs at memory bandwidth, far
+        cheaper than decoding or inference, and any byte that differs
+        changes the key.
+        """
+        if xxhash is not None:
+            return xxhash.xxh3_128_hexdigest(image_bytes)
+        return hashlib.blake2b(image_bytes, digest_size=16).hexdigest()
 
     def _is_expired(self, entry: CacheEntry) -> bool:
         """Check if cache entry has expired"""
-        return (time.time() - entry.timestamp) > self.ttl_seconds
+        return (time.monotonic() - entry.timestamp) > self.ttl_seconds
 
-    def _evict_lru(self):
-        """Evict least recently used entry"""
-        if self._access_order:
-            lru_key = self._access_order.pop(0)
-            self._cache.pop(lru_key, None)
+    def _shard_for(self, cache_key: str) -> _LRUShard:
+        """Pick the shard for a cache key"""
+        return self._shards[int(cache_key[:8], 16) % self.num_shards]
 
     def get(self, image_bytes: bytes) -> Optional[Any]:
         """
@@ -54,25 +190,29 @@ class SegmentationCache:
             Cached data if exists and valid, None otherwise
         """
         cache_key = self._compute_hash(image_bytes)
+        shard = self._shard_for(cache_key)
 
-        with self._lock:
-            entry = self._cache.get(cache_key)
+        # Lock-free read; list/dict reads are atomic under the GIL
+        entry = shard.lookup(cache_key)
 
-            if entry is None:
-                return None
+        if entry is None:
+            return None
 
-            # Check if expired
-            if self._is_expired(entry):
-                self._cache.pop(cache_key)
-                self._access_order.remove(cache_key)
-                return None
+        # Check if expired
+        if self._is_expired(entry):
+            with shard.lock:
+                # Only drop it if nobody replaced it in the meantime
+                shard.remove(cache_key, entry)
+            return None
 
-            # Update access order (move to end for LRU)
-            if cache_key in self._access_order:
-                self._access_order.remove(cache_key)
-            self._access_order.append(cache_key)
+        # Best-effort recency update: skip it rather than wait on a writer
+        if shard.lock.acquire(blocking=False):
+            try:
+                shard.touch(cache_key)
+            finally:
+                shard.lock.release()
 
-            return entry.data
+        return entry.data
 
     def set(self, image_bytes: bytes, data: Any):
         """
@@ -83,47 +223,62 @@ class SegmentationCache:
             data: Segmentation result data
         """
         cache_key = self._compute_hash(image_bytes)
+        shard = self._shard_for(cache_key)
 
-        with self._lock:
-            # Evict if at capacity
-            if len(self._cache) >= self.max_size and cache_key not in self._cache:
-                self._evict_lru()
-
-            # Store entry
+        with shard.lock:
+            # Store entry (evicts the shard's LRU entry if full)
             entry = CacheEntry(
                 data=data,
-                timestamp=time.time(),
+                timestamp=time.monotonic(),
                 image_hash=cache_key
             )
-            self._cache[cache_key] = entry
+            shard.insert(cache_key, entry)
 
-            # Update access order
-            if cache_key in self._access_order:
-                self._access_order.remove(cache_key)
-            self._access_order.append(cache_key)
+            # Lazily trim expired entries from the LRU end so stale data
+            # doesn't hold slots until it happens to be looked up
+            oldest = shard.oldest()
+            while oldest is not None and self._is_expired(oldest):
+                shard.remove(oldest.image_hash, oldest)
+                oldest = shard.oldest()
 
     def clear(self):
         """Clear all cache entries"""
-        with self._lock:
-            self._cache.clear()
-            self._access_order.clear()
+        for shard in self._shards:
+            with shard.lock:
+                # Swap in fresh arrays so lock-free readers never see them mid-clear
+                shard.reset()
 
     def get_stats(self) -> Dict[str, Any]:
         """Get cache statistics"""
-        with self._lock:
-            return {
-                "size": len(self._cache),
-                "max_size": self.max_size,
-                "ttl_seconds": self.ttl_seconds,
-                "entries": [
-                    {
-                        "hash": entry.image_hash[:8],
-                        "age_seconds": time.time() - entry.timestamp
-                    }
-                    for entry in self._cache.values()
-                ]
+        # Snapshot just (hash, timestamp) under each lock; format outside it
+        snapshot = []
+        for shard in self._shards:
+            with shard.lock:
+                snapshot.extend(
+                    (entry.image_hash, entry.timestamp) for entry in shard.values()
+                )
+
+        now = time.monotonic()
+        entries = [
+            {
+                "hash": image_hash[:8],
+                "age_seconds": now - timestamp
             }
+            for image_hash, timestamp in snapshot
+        ]
+
+        return {
+            "size": len(entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "num_shards": self.num_shards,
+            "entries": entries
+        }
 
 
 # Global cache instance
 segmentation_cache = SegmentationCache(max_size=100, ttl_seconds=300)
+
+# Decoded (BGR frame, RGB image) pairs for the render endpoint (kept small:
+# each is several MB)
+decoded_cache = SegmentationCache(max_size=16, ttl_seconds=300, num_shards=4)
@@ -1,18 +1,21 @@
 # backend/main.py
-from fastapi import FastAPI, File, UploadFile, Form
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import Response, StreamingResponse
 from typing import Optional
+from types import MappingProxyType
 import sys
 import os
 from pathlib import Path
 import io
+import asyncio
 import cv2
 import numpy as np
 
-from model_rf_deter import run_inference, model
+from model_rf_deter import run_inference, predict
 from schemas import NailResponse, NailInstance
-from utils import read_image_from_bytes
+from utils import read_image_from_bytes, read_frame_from_bytes, image_from_bgr
+from cache import segmentation_cache, decoded_cache
 
 # Add professional renderer to path
 sys.path.insert(0, str(Path(__file__).parent.parent / 'professional_nail_renderer'))
@@ -45,17 +48,26 @@ professional_renderer = PhotoRealisticNailRenderer(
 )
 print("✅ Professional renderer ready!")
 
+# Material presets are immutable at runtime; build them once
+PRESETS = MappingProxyType(MaterialPresets.all_presets())
+
 
 # Helper function
 def hex_to_rgb(hex_color: str) -> tuple:
     """Convert hex color to RGB tuple"""
-    hex_color = hex_color.lstrip('#')
-    return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+    value = int(hex_color.lstrip('#'), 16)
+    return ((value >> 16) & 0xFF, (value >> 8) & 0xFF, value & 0xFF)
 
 
 @app.post("/api/nails/segment", response_model=NailResponse)
 async def segment_nails(file: UploadFile = File(...)):
     raw = await file.read()
+
+    # Hash + lookup off the event loop thread
+    cached_result = await asyncio.to_thread(segmentation_cache.get, raw)
+    if cached_result is not None:
+        return Response(content=cached_result, media_type="application/json")
+
     img = read_image_from_bytes(raw)
 
     result = run_inference(img)
@@ -68,11 +80,16 @@ async def segment_nails(file: UploadFile = File(...)):
         for n in result["nails"]
     ]
 
-    return NailResponse(
+    response = NailResponse(
         width=result["width"],
         height=result["height"],
         nails=nails,
     )
+    # Serialize once and cache the JSON bytes so hits skip Pydantic entirely
+    body = response.model_dump_json().encode()
+    await asyncio.to_thread(segmentation_cache.set, raw, body)
+
+    return Response(content=body, media_type="application/json")
 
 
 @app.post("/api/nails/render-professional")
@@ -98,19 +115,29 @@ async def render_professional(
     Returns:
         Rendered image as JPEG with metadata headers
     """
-    # Load image
+    # Load image, reusing the decoded frame when the same upload is
+    # re-rendered (e.g. the user switching materials)
     raw = await file.read()
-    img = read_image_from_bytes(raw)
+    decoded = await asyncio.to_thread(decoded_cache.get, raw)
+    if decoded is None:
+        # Decode directly to BGR for OpenCV
+        frame = read_frame_from_bytes(raw)
+        if frame is None:
+            raise HTTPException(status_code=400, detail="Could not decode image")
+
+        # Shared between requests, so guard against in-place edits
+        frame.setflags(write=False)
 
-    # Convert to numpy array (BGR for OpenCV)
-    frame = np.array(img)
-    frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+        # RGB image for the model, converted once and cached with the frame
+        decoded = (frame, image_from_bgr(frame))
+        await asyncio.to_thread(decoded_cache.set, raw, decoded)
+
+    frame, img = decoded
 
     # Run RF-DETR segmentation
-    detections = model.predict(img, threshold=0.2)
+    detections = predict(img, threshold=0.2)
 
     # Get or create material
-    presets = MaterialPresets.all_presets()
     if custom_color is not None:
         # Custom material from frontend parameters
         color_rgb = hex_to_rgb(custom_color)
@@ -121,15 +148,17 @@ async def render_professional(
             opacity=intensity,
             specular_intensity=1.0 + glossiness * 0.5
         )
-    elif material in presets:
+    elif material in PRESETS:
         # Use preset
-        material_obj = presets[material]
+        material_obj = PRESETS[material]
     else:
         # Fallback to glossy red
-        material_obj = presets["glossy_red"]
+        material_obj = PRESETS["glossy_red"]
 
-    # Render each nail
-    result = frame.copy()
+    # Render each nail. render_nail returns a new image rather than writing
+    # into its input, so the (read-only, cached) frame needs no copy and is
+    # returned as-is when no nails are found.
+    result = frame
     nail_count = 1
 
     if detections.mask is not None:
@@ -145,15 +174,11 @@ async def render_professional(
             result = professional_renderer.render_nail(result, geometry, material_obj)
             nail_count += 1
 
-    # Convert back to RGB
-    result_rgb = cv2.cvtColor(result, cv2.COLOR_BGR2RGB)
-    from PIL import Image as PILImage
-    result_pil = PILImage.fromarray(result_rgb)
-
-    # Encode to JPEG
-    img_byte_arr = io.BytesIO()
-    result_pil.save(img_byte_arr, format='JPEG', quality=95)
-    img_byte_arr.seek(0)
+    # Encode to JPEG straight from the BGR buffer
+    ok, jpeg = cv2.imencode('.jpg', result, [int(cv2.IMWRITE_JPEG_QUALITY), 95])
+    if not ok:
+        raise HTTPException(status_code=500, detail="Failed to encode rendered image")
+    img_byte_arr = io.BytesIO(jpeg.tobytes())
 
     return StreamingResponse(
         img_byte_arr,
@@ -175,10 +200,9 @@ async def get_materials():
     Returns:
         JSON with material preset information
     """
-    presets = MaterialPresets.all_presets()
     materials = []
 
-    for name, mat in presets.items():
+    for name, mat in PRESETS.items():
         materials.append({
             "name": name,
             "display_name": name.replace('_', ' ').title(),
@@ -1,7 +1,21 @@
 # backend/utils.py
 from io import BytesIO
+import cv2
+import numpy as np
 from PIL import Image
 
 
 def read_image_from_bytes(data: bytes) -> Image.Image:
-    return Image.open(BytesIO(data)).convert("RGB")
\ No newline at end of file
+    return Image.open(BytesIO(data)).convert("RGB")
+
+
+def read_frame_from_bytes(data: bytes) -> np.ndarray:
+    # Decode straight to BGR; ignore EXIF orientation to match PIL decoding
+    return cv2.imdecode(
+        np.frombuffer(data, np.uint8),
+        cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION
+    )
+
+
+def image_from_bgr(frame: np.ndarray) -> Image.Image:
+    return Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
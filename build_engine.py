@@ -0,0 +1,104 @@
+"""
+Build a TensorRT engine from the TorchScript RF-DETR model
+TorchScript (.pt) -> ONNX -> TensorRT (.plan) for live_inference_professional.py
+"""
+
+import torch
+import os
+import sys
+import argparse
+
+MODEL_PATH = "./pytorch_mobile_models/rfdetr_nails.pt"
+OUTPUT_DIR = "./tensorrt_models"
+
+
+def export_onnx(model_path, onnx_path):
+    """Export the TorchScript model to ONNX at the fixed 1x3x432x432 input"""
+    print(f"\n📤 Exporting to ONNX: {onnx_path}")
+
+    model = torch.jit.load(model_path, map_location="cpu")
+    model.eval()
+    dummy_input = torch.randn(1, 3, 432, 432)
+
+    with torch.no_grad():
+        # Legacy exporter: the input is a TorchScript module, not eager
+        torch.onnx.export(
+            model,
+            dummy_input,
+            onnx_path,
+            export_params=True,
+            opset_version=18,
+            do_constant_folding=True,
+            input_names=['images'],
+            dynamo=False
+        )
+
+    print("✅ ONNX export successful!")
+
+
+def build_engine(onnx_path, engine_path, fp16=True, workspace_gb=4):
+    """Parse the ONNX graph and serialize an optimized TensorRT engine"""
+    import tensorrt as trt
+
+    print(f"\n⚙️ Building TensorRT engine: {engine_path}")
+
+    logger = trt.Logger(trt.Logger.WARNING)
+    builder = trt.Builder(logger)
+    network = builder.create_network(0)
+    parser = trt.OnnxParser(network, logger)
+
+    with open(onnx_path, "rb") as f:
+        if not parser.parse(f.read()):
+            for i in range(parser.num_errors):
+                print(f"❌ {parser.get_error(i)}")
+            return False
+
+    config = builder.create_builder_config()
+    config.set_memory_pool_limit(trt.MemoryPoolType.WORKSPACE, workspace_gb << 30)
+    if fp16:
+        config.set_flag(trt.BuilderFlag.FP16)
+
+    serialized = builder.build_serialized_network(network, config)
+    if serialized is None:
+        print("❌ Engine build failed")
+        return False
+
+    with open(engine_path, "wb") as f:
+        f.write(serialized)
+
+    file_size_mb = os.path.getsize(engine_path) / (1024 * 1024)
+    print(f"✅ Engine built ({file_size_mb:.2f} MB)")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build a TensorRT engine for RF-DETR')
+    parser.add_argument('--model', type=str, default=MODEL_PATH, help='TorchScript model path')
+    parser.add_argument('--fp32', action='store_true', help='Disable FP16 kernels')
+    parser.add_argument('--workspace', type=int, default=4, help='Builder workspace (GB)')
+    args = parser.parse_args()
+
+    print("\n" + "="*60)
+    print("RF-DETR to TensorRT Engine")
+    print("="*60)
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    onnx_path = os.path.join(OUTPUT_DIR, "rfdetr_nails.onnx")
+    engine_path = os.path.join(OUTPUT_DIR, "rfdetr_nails.plan")
+
+    try:
+        export_onnx(args.model, onnx_path)
+    except Exception as e:
+        print(f"❌ ONNX export failed: {e}")
+        return 1
+
+    if not build_engine(onnx_path, engine_path, fp16=not args.fp32, workspace_gb=args.workspace):
+        return 1
+
+    print("\n🎉 Engine ready! Run with:")
+    print(f"   python live_inference_professional.py --model {engine_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
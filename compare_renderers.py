@@ -4,10 +4,12 @@ Compare basic rendering vs professional photo-realistic rendering
 """
 
 import torch
+import torch.nn.functional as F
 import cv2
 import numpy as np
 import time
 import argparse
+from collections import deque
 import sys
 import os
 
@@ -17,9 +19,112 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'professional_nail_re
 from professional_nail_renderer.nail_geometry import NailGeometryAnalyzer
 from professional_nail_renderer.nail_material import MaterialPresets
 from professional_nail_renderer.photo_realistic_renderer import PhotoRealisticNailRenderer
+from pipeline_utils import ThreadedCapture
 
 MODEL_PATH = "./pytorch_mobile_models/rfdetr_nails.pt"
 
+# Device used for batched mask resizing
+RESIZE_DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+
+# Upper bound on detections rendered per frame
+MAX_DETECTIONS = 10
+
+# Run the display path (HUD text, resize, imshow) through OpenCL when present
+USE_UMAT = cv2.ocl.haveOpenCL()
+
+
+def resize_masks(masks, size, mode):
+    """
+    Resize a stack of masks in a single call.
+
+    Args:
+        masks: Array of shape (N, h, w)
+        size: Output (height, width)
+        mode: 'nearest' or 'bilinear'
+
+    Returns:
+        float32 array of shape (N, H, W)
+    """
+    if len(masks) == 0:
+        return np.zeros((0, *size), dtype=np.float32)
+
+    batch = torch.from_numpy(np.ascontiguousarray(masks, dtype=np.float32))
+    batch = batch.to(RESIZE_DEVICE).unsqueeze(1)
+    if mode == "nearest":
+        resized = F.interpolate(batch, size=size, mode=mode)
+    else:
+        resized = F.interpolate(batch, size=size, mode=mode, align_corners=False)
+    return resized.squeeze(1).cpu().numpy()
+
+
+def make_blend_kernel(color, alpha):
+    """
+    Build a mask blend specialized for a fixed color and alpha.
+
+    The returned function adds `alpha * color` to the masked pixels of
+    `overlay` in place. That is equivalent to addWeighted(overlay, 1,
+    colored_mask, alpha, 0) with a colored mask, but done in a single
+    saturating pass with no full-frame temporaries. The scaled color is
+    computed once here rather than on every call.
+    """
+    scaled_color = tuple(c * alpha for c in color) + (0,)
+
+    def blend(overlay, binary_mask):
+        cv2.add(overlay, scaled_color, dst=overlay, mask=binary_mask)
+
+    return blend
+
+
+def select_detections(scores, num_detections, threshold, max_detections=MAX_DETECTIONS):
+    """
+    Indices of the detections to render, at most `max_detections` of them.
+
+    Detections above `threshold` are kept, highest scores first when there
+    are more than the cap; without scores the first `max_detections` are
+    used. Filtering runs on the score tensor, so only the selected indices
+    are converted to NumPy.
+    """
+    if scores is None:
+        return np.arange(min(max_detections, num_detections))
+
+    confidence_scores = scores[0, :, 1]
+
+    candidates = (confidence_scores > threshold).nonzero(as_tuple=True)[0]
+    if len(candidates) > max_detections:
+        top = torch.topk(confidence_scores[candidates], max_detections, sorted=False).indices
+        candidates = candidates[top]
+    return candidates.numpy()
+
+
+class GpuBasicBlend(torch.nn.Module):
+    """Resize, threshold, area-filter and blend all basic-render masks on the GPU"""
+
+    def forward(self, frame, masks, color, alpha: float, min_area: int = 100):
+        """
+        Args:
+            frame: (H, W, 3) uint8 tensor
+            masks: (N, h, w) float tensor of candidate masks
+            color: (3,) float tensor, BGR
+            alpha: Blend weight of the color
+            min_area: Masks with fewer pixels are dropped
+
+        Returns:
+            Blended (H, W, 3) uint8 frame and the (K, H, W) bool masks kept
+        """
+        frame_h, frame_w = frame.shape[:2]
+
+        binary = F.interpolate(
+            masks.unsqueeze(1), size=(frame_h, frame_w), mode="nearest"
+        ).squeeze(1) > 0.5
+        binary = binary[binary.sum(dim=(1, 2)) >= min_area]
+
+        # Tint the union of all kept masks in one vectorized pass
+        union = binary.any(dim=0).unsqueeze(-1)
+        blended = frame.float() + union * (color * alpha)
+
+        # Round (half to even) like cv2's saturate_cast rather than truncate
+        return blended.round_().clamp_(0, 255).to(torch.uint8), binary
+
 
 class BasicRenderer:
     """Original basic rendering for comparison"""
@@ -27,106 +132,146 @@ class BasicRenderer:
     def __init__(self, color=(0, 0, 255)):
         self.color = color
 
+        # Reused output buffer (reallocated only when the frame size changes)
+        self._overlay_buf = None
+
+        # Blend with the color baked in
+        self._blend = make_blend_kernel(color, alpha=0.4)
+
+        # Structuring element for outline extraction
+        self._outline_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+
+        # On CUDA, resize/threshold/blend run on-device in one module call
+        if RESIZE_DEVICE == "cuda":
+            self._gpu_blend = GpuBasicBlend()
+            self._color_gpu = torch.tensor(color, dtype=torch.float32, device=RESIZE_DEVICE)
+        else:
+            self._gpu_blend = None
+
     def render(self, frame, masks, scores, confidence_threshold=0.2):
-        """Basic flat color overlay"""
-        overlay = frame.copy()
+        """
+        Basic flat color overlay.
+
+        The returned overlay is an internal buffer that is overwritten by the
+        next call; copy it if it needs to outlive that.
+        """
+        if self._overlay_buf is None or self._overlay_buf.shape != frame.shape:
+            self._overlay_buf = np.empty_like(frame)
+        overlay = self._overlay_buf
         num_detections = masks.shape[0]
         frame_h, frame_w = frame.shape[:2]
 
-        if scores is not None:
-            class_scores = scores.squeeze(0).numpy()
-            confidence_scores = class_scores[:, 1]
-        else:
-            confidence_scores = None
+        valid_indices = select_detections(scores, num_detections, confidence_threshold)
 
-        # Filter valid detections
-        if confidence_scores is not None:
-            valid_indices = np.where(confidence_scores > confidence_threshold)[0]
-        else:
-            valid_indices = range(min(10, num_detections))
+        if self._gpu_blend is not None:
+            return self._render_gpu(frame, overlay, masks[valid_indices])
 
-        detected = 0
-        for idx in valid_indices:
-            mask = masks[idx]
-
-            # Resize mask
-            mask_resized = cv2.resize(
-                mask,
-                (frame_w, frame_h),
-                interpolation=cv2.INTER_NEAREST
-            )
+        np.copyto(overlay, frame)
 
-            # Threshold
-            binary_mask = (mask_resized > 0.5).astype(np.uint8)
+        # Resize all candidate masks at once
+        masks_resized = resize_masks(masks[valid_indices], (frame_h, frame_w), "nearest")
 
-            if np.sum(binary_mask) < 100:
+        # Every nail gets the same flat tint, so blend and outline the union
+        # of all kept masks once instead of once per detection
+        union = None
+        detected = 0
+        for mask_resized in masks_resized:
+            # Threshold straight to a uint8 0/255 mask
+            binary_mask = cv2.compare(mask_resized, 0.5, cv2.CMP_GT)
+
+            if cv2.countNonZero(binary_mask) < 100:
                 continue
 
             detected += 1
 
-            # Create colored mask
-            colored_mask = np.zeros_like(frame)
-            colored_mask[binary_mask == 1] = self.color
+            if union is None:
+                union = binary_mask
+            else:
+                cv2.bitwise_or(union, binary_mask, dst=union)
 
-            # Simple blend
-            overlay = cv2.addWeighted(overlay, 1, colored_mask, 0.4, 0)
+        if union is not None:
+            # Simple blend (in place, masked pixels only)
+            self._blend(overlay, union)
 
-            # Draw contours
-            contours, _ = cv2.findContours(
-                binary_mask,
-                cv2.RETR_EXTERNAL,
-                cv2.CHAIN_APPROX_SIMPLE
-            )
-            if contours:
-                cv2.drawContours(overlay, contours, -1, self.color, 2)
+            # Draw outline
+            self._draw_outline(overlay, union)
 
         return overlay, detected
 
+    def _draw_outline(self, overlay, binary_mask):
+        """
+        Paint the mask outline in place.
+
+        The outline is only drawn, never analyzed, so a morphological
+        gradient replaces contour tracing + polyline rasterization. With a
+        3x3 kernel it yields a ~2 px band straddling the mask edge.
+        """
+        edges = cv2.morphologyEx(binary_mask, cv2.MORPH_GRADIENT, self._outline_kernel)
+        overlay[edges > 0] = self.color
+
+    def _render_gpu(self, frame, overlay, masks):
+        """GPU path: one device round-trip, then outlines on the CPU"""
+        frame_gpu = torch.from_numpy(frame).to(RESIZE_DEVICE, non_blocking=True)
+        masks_gpu = torch.from_numpy(
+            np.ascontiguousarray(masks, dtype=np.float32)
+        ).to(RESIZE_DEVICE, non_blocking=True)
+
+        blended, kept = self._gpu_blend(frame_gpu, masks_gpu, self._color_gpu, 0.4)
+        np.copyto(overlay, blended.cpu().numpy())
+
+        if len(kept):
+            union = kept.any(dim=0).to(torch.uint8).cpu().numpy()
+            self._draw_outline(overlay, union)
+
+        return overlay, len(kept)
+
 
 class ProfessionalRenderer:
     """Professional photo-realistic rendering"""
 
+    # Stateless, so one analyzer serves every renderer instance
+    geometry_analyzer = NailGeometryAnalyzer()
+
     def __init__(self, material_preset="glossy_red"):
-        self.geometry_analyzer = NailGeometryAnalyzer()
         self.renderer = PhotoRealisticNailRenderer(
             light_direction=(-0.3, -0.5, 0.8),
             ambient_intensity=0.4
         )
+        self.material_name = material_preset
+
+    @property
+    def material_name(self):
+        return self._material_name
+
+    @material_name.setter
+    def material_name(self, name):
+        """Switch material without rebuilding the renderer"""
         presets = MaterialPresets.all_presets()
-        self.material = presets.get(material_preset, presets["glossy_red"])
+        if name not in presets:
+            name = "glossy_red"
+        self._material_name = name
+        self._material = presets[name]
+
+    @property
+    def material(self):
+        return self._material
 
     def render(self, frame, masks, scores, confidence_threshold=0.2):
         """Professional rendering with all effects"""
         num_detections = masks.shape[0]
         frame_h, frame_w = frame.shape[:2]
 
-        if scores is not None:
-            class_scores = scores.squeeze(0).numpy()
-            confidence_scores = class_scores[:, 1]
-        else:
-            confidence_scores = None
+        valid_indices = select_detections(scores, num_detections, confidence_threshold)
 
-        # Filter valid detections
-        if confidence_scores is not None:
-            valid_indices = np.where(confidence_scores > confidence_threshold)[0]
-        else:
-            valid_indices = range(min(10, num_detections))
+        # Resize all candidate masks at once
+        masks_resized = resize_masks(masks[valid_indices], (frame_h, frame_w), "bilinear")
 
         geometries = []
-        for idx in valid_indices:
-            mask = masks[idx]
-
-            # Resize mask
-            mask_resized = cv2.resize(
-                mask,
-                (frame_w, frame_h),
-                interpolation=cv2.INTER_LINEAR
-            )
+        for mask_resized in masks_resized:
+            # Threshold straight to a uint8 0/255 mask
+            binary_mask = cv2.compare(mask_resized, 0.5, cv2.CMP_GT)
 
-            # Threshold
-            binary_mask = (mask_resized > 0.5).astype(np.uint8)
-
-            if np.sum(binary_mask) < 100:
+            if cv2.countNonZero(binary_mask) < 100:
                 continue
 
             # Analyze geometry
@@ -134,10 +279,8 @@ class ProfessionalRenderer:
             if geometry is not None:
                 geometries.append(geometry)
 
-        # Render all nails
-        result = frame.copy()
-        for geometry in geometries:
-            result = self.renderer.render_nail(result, geometry, self.material)
+        # Render all nails, compositing onto the frame in a single pass
+        result = self.renderer.render_nails_batch(frame, geometries, self.material)
 
         return result, len(geometries)
 
@@ -146,17 +289,8 @@ def create_comparison_grid(image, basic_result, professional_result):
     """Create a side-by-side comparison grid"""
     h, w = image.shape[:2]
 
-    # Create grid
-    grid = np.zeros((h, w * 3, 3), dtype=np.uint8)
-
-    # Original
-    grid[:, 0:w] = image
-
-    # Basic
-    grid[:, w:w*2] = basic_result
-
-    # Professional
-    grid[:, w*2:w*3] = professional_result
+    # Create grid: original | basic | professional (no zero-fill needed)
+    grid = np.concatenate((image, basic_result, professional_result), axis=1)
 
     # Add labels
     font = cv2.FONT_HERSHEY_SIMPLEX
@@ -197,6 +331,10 @@ def main():
     parser.add_argument('--threshold', type=float, default=0.2, help='Confidence threshold')
     parser.add_argument('--material', type=str, default='glossy_red', help='Material preset')
     parser.add_argument('--output', type=str, help='Save comparison to file')
+    parser.add_argument('--skip', type=int, default=1,
+                        help='Process every N-th camera frame (skipped frames are not decoded)')
+    parser.add_argument('--verbose', action='store_true',
+                        help='Log averaged timings to stdout once per second (camera mode)')
     args = parser.parse_args()
 
     print("\n" + "="*80)
@@ -207,8 +345,24 @@ def main():
     print(f"📦 Loading model...")
     model = torch.jit.load(args.model)
     model.eval()
-    torch.set_grad_enabled(False)
-    print("✅ Model loaded")
+
+    # FP16 on CUDA (tensor cores, half the weight bandwidth); CPU stays FP32
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    dtype = torch.float16 if device == "cuda" else torch.float32
+    model = model.to(device=device, dtype=dtype, memory_format=torch.channels_last)
+
+    # Fold constants (conv-bn, dropout) into the graph for the fixed
+    # inference setup; models that are already frozen are used as-is
+    try:
+        model = torch.jit.optimize_for_inference(torch.jit.freeze(model))
+    except RuntimeError as e:
+        print(f"⚠️  Graph freezing skipped: {e}")
+    print(f"✅ Model loaded ({device}, {dtype})")
+
+    # Reusable channels_last input tensor; each frame is copied into it
+    img_tensor = torch.empty(
+        1, 3, 432, 432, device=device, dtype=dtype
+    ).contiguous(memory_format=torch.channels_last)
 
     # Initialize renderers
     print("🎨 Initializing renderers...")
@@ -230,6 +384,8 @@ def main():
         if not cap.isOpened():
             print("❌ Failed to open camera")
             return 1
+        # Capture on a background thread, overlapping with inference/render
+        cap = ThreadedCapture(cap, skip=args.skip, maxsize=2)
         print("✅ Camera opened")
         single_frame_mode = False
 
@@ -242,6 +398,12 @@ def main():
 
     paused = False
 
+    # Rolling timings for periodic (not per-frame) logging
+    inference_times = deque(maxlen=30)
+    basic_times = deque(maxlen=30)
+    professional_times = deque(maxlen=30)
+    last_log = time.time()
+
     try:
         while True:
             if not single_frame_mode:
@@ -253,16 +415,23 @@ def main():
                 # Single frame mode
                 pass
 
-            # Preprocess
-            resized = cv2.resize(frame, (432, 432), interpolation=cv2.INTER_AREA)
-            rgb_normalized = cv2.cvtColor(resized, cv2.COLOR_BGR2RGB).astype(np.float32) / 255.0
-            img_array = np.transpose(rgb_normalized, (2, 0, 1))
-            img_tensor = torch.from_numpy(img_array).unsqueeze(0)
+            # Preprocess: resize + BGR->RGB + /255 + HWC->NCHW in one call
+            blob = cv2.dnn.blobFromImage(
+                frame, scalefactor=1.0 / 255.0, size=(432, 432),
+                mean=(0, 0, 0), swapRB=True, crop=False
+            )
+            img_tensor.copy_(torch.from_numpy(blob))
 
             # Run inference
-            print("⚙️  Running inference...")
             start_inference = time.time()
-            outputs = model(img_tensor)
+            with torch.inference_mode():
+                outputs = model(img_tensor)
+
+                # Back to FP32 host tensors for NumPy/OpenCV post-processing
+                if isinstance(outputs, tuple):
+                    outputs = tuple(out.float().cpu() for out in outputs)
+                else:
+                    outputs = outputs.float().cpu()
             inference_time = (time.time() - start_inference) * 1000
 
             if isinstance(outputs, tuple):
@@ -274,24 +443,35 @@ def main():
                 scores = None
 
             masks = mask_tensor.squeeze(0).numpy()
-            print(f"✅ Inference: {inference_time:.1f}ms")
 
             # Basic rendering
-            print("🎨 Basic rendering...")
             start_basic = time.time()
             basic_result, basic_count = basic.render(frame, masks, scores, args.threshold)
             basic_time = (time.time() - start_basic) * 1000
-            print(f"✅ Basic: {basic_time:.1f}ms ({basic_count} nails)")
 
             # Professional rendering
-            print("✨ Professional rendering...")
             start_pro = time.time()
             professional_result, pro_count = professional.render(frame, masks, scores, args.threshold)
             professional_time = (time.time() - start_pro) * 1000
-            print(f"✅ Professional: {professional_time:.1f}ms ({pro_count} nails)")
+
+            inference_times.append(inference_time)
+            basic_times.append(basic_time)
+            professional_times.append(professional_time)
+
+            # stdout is slow on some terminals; the HUD is the live feedback,
+            # so only log once per second (or once for a single image)
+            now = time.time()
+            if single_frame_mode or (args.verbose and now - last_log >= 1.0):
+                last_log = now
+                print(f"⏱️  Inference: {np.mean(inference_times):.1f}ms | "
+                      f"Basic: {np.mean(basic_times):.1f}ms ({basic_count} nails) | "
+                      f"Professional: {np.mean(professional_times):.1f}ms ({pro_count} nails)")
 
             # Create comparison
             comparison = create_comparison_grid(frame, basic_result, professional_result)
+            display_h, display_w = comparison.shape[:2]
+            if USE_UMAT:
+                comparison = cv2.UMat(comparison)
 
             # Add timing info
             timing_text = [
@@ -301,7 +481,7 @@ def main():
                 f"Speedup: {professional_time/basic_time:.1f}x slower (worth it!)"
             ]
 
-            y = comparison.shape[0] - 100
+            y = display_h - 100
             for text in timing_text:
                 cv2.putText(
                     comparison, text,
@@ -313,7 +493,6 @@ def main():
 
             # Display
             # Resize for display if too large
-            display_h, display_w = comparison.shape[:2]
             max_width = 1920
             if display_w > max_width:
                 scale = max_width / display_w
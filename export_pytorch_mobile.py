@@ -6,12 +6,132 @@ This is the recommended approach for deploying complex models on Android
 import torch
 import os
 import sys
+import argparse
+from copy import deepcopy
 from pathlib import Path
 
 CHECKPOINT_PATH = "/home/usama-naveed/nail_AR-rfdeter/output/checkpoint_best_total.pth"
 OUTPUT_DIR = "./pytorch_mobile_models"
 
+def quantize_int8(module):
+    """
+    Dynamic INT8 quantization for the QNNPACK (ARM) backend.
+
+    Linear weights are stored as int8 and activations are quantized on the
+    fly, so the transformer decoder/encoder projections - the bulk of the
+    weights - run on int8 kernels. Applied to the eager module before
+    tracing; static (calibrated) quantization would need QuantStub/DeQuantStub
+    inserted inside the rfdetr architecture itself.
+    """
+    torch.backends.quantized.engine = "qnnpack"
+    return torch.ao.quantization.quantize_dynamic(
+        module, {torch.nn.Linear}, dtype=torch.qint8
+    )
+
+
+def prune_2_4(module):
+    """
+    Apply 2:4 semi-structured sparsity to the Linear weights.
+
+    Within every block of 4 consecutive input-channel weights of each
+    (out, in) matrix the 2 smallest-magnitude ones are zeroed - the layout
+    semi-structured sparse GEMM kernels accept. Conv2d weights are left
+    dense: their 4-D blocks would run along the kernel width, which no
+    sparse kernel uses. The CPU/mobile kernels here stay dense, so this
+    mainly prepares the weights for a sparse backend rather than speeding
+    up this export. Post-training, without fine-tuning: check mask quality
+    before shipping.
+    """
+    from torch.ao.pruning import WeightNormSparsifier
+
+    config = [
+        {"tensor_fqn": f"{name}.weight"}
+        for name, layer in module.named_modules()
+        if isinstance(layer, torch.nn.Linear)
+    ]
+
+    sparsifier = WeightNormSparsifier(
+        sparsity_level=1.0, sparse_block_shape=(1, 4), zeros_per_block=2
+    )
+    sparsifier.prepare(module, config)
+    sparsifier.step()
+    sparsifier.squash_mask()
+    return module
+
+
+def quantize_int8_int4(module, group_size=32):
+    """
+    TorchAO INT8 dynamic-activation / INT4 grouped-weight quantization.
+
+    This is the scheme XNNPACK has dedicated kernels for, and the one
+    TorchAO's Int8DynActInt4WeightQATQuantizer converts to - a checkpoint
+    fine-tuned with that quantizer's fake-quant ends up with the same
+    layout after this step.
+    """
+    from torchao.quantization import quantize_, int8_dynamic_activation_int4_weight
+
+    quantize_(module, int8_dynamic_activation_int4_weight(group_size=group_size))
+    return module
+
+
+def outputs_match(reference, candidate, example, atol):
+    """Whether two TorchScript modules agree on `example` within `atol`"""
+    with torch.no_grad():
+        expected = reference(example)
+        actual = candidate(example)
+
+    if isinstance(expected, torch.Tensor):
+        expected, actual = (expected,), (actual,)
+
+    return all(
+        torch.allclose(e.float(), a.float(), atol=atol)
+        for e, a in zip(expected, actual)
+        if isinstance(e, torch.Tensor)
+    )
+
+
+def export_executorch(module, example, pte_path):
+    """
+    Export an eager module to an ExecuTorch program delegated to XNNPACK.
+
+    XNNPACK takes the Conv/MatMul-heavy partitions and runs them on its
+    NEON microkernels; the lean ExecuTorch runtime replaces the lite
+    interpreter on device.
+    """
+    from executorch.exir import to_edge
+    from executorch.backends.xnnpack.partition.xnnpack_partitioner import XnnpackPartitioner
+
+    exported = torch.export.export(module.eval(), (example,))
+    edge = to_edge(exported).to_backend(XnnpackPartitioner())
+    program = edge.to_executorch()
+
+    with open(pte_path, "wb") as f:
+        f.write(program.buffer)
+
+
 def main():
+    parser = argparse.ArgumentParser(description='Export RF-DETR to PyTorch Mobile')
+    precision = parser.add_mutually_exclusive_group()
+    precision.add_argument('--quantize', action='store_true',
+                           help='Quantize Linear layers to INT8 (QNNPACK) before export')
+    precision.add_argument('--fp16', action='store_true',
+                           help='Export FP16 weights (expects FP16 input)')
+    parser.add_argument('--prune', action='store_true',
+                        help='Apply 2:4 sparsity to Linear weights before export (no fine-tuning)')
+    parser.add_argument('--executorch', action='store_true',
+                        help='Export an ExecuTorch .pte (XNNPACK) instead of a lite-interpreter .ptl')
+    parser.add_argument('--int4', action='store_true',
+                        help='With --executorch: INT8 activations / INT4 weights via TorchAO')
+    args = parser.parse_args()
+    dtype = torch.float16 if args.fp16 else torch.float32
+
+    if args.executorch and args.quantize:
+        parser.error("--quantize applies to the lite-interpreter export only")
+    if args.int4 and not args.executorch:
+        parser.error("--int4 requires --executorch")
+    if args.int4 and args.fp16:
+        parser.error("--int4 and --fp16 are mutually exclusive")
+
     print("\n" + "="*60)
     print("RF-DETR to PyTorch Mobile Export")
     print("="*60 + "\n")
@@ -25,10 +145,46 @@ def main():
     model = RFDETRSegPreview(pretrain_weights=CHECKPOINT_PATH)
     print("✅ Model loaded")
 
+    if args.prune:
+        print("\n✂️  Pruning to 2:4 sparsity...")
+        model.model.model = prune_2_4(model.model.model.eval())
+        print("✅ Model pruned (verify mask quality before shipping)")
+
+    if args.executorch:
+        pte_path = os.path.join(OUTPUT_DIR, "rfdetr_nails.pte")
+        print(f"\n📤 Exporting to ExecuTorch (XNNPACK): {pte_path}")
+        try:
+            # Same preparation optimize_for_inference does for the .ptl
+            # path: a CPU eval copy switched to rfdetr's export forward
+            # (plain tensors in/out), leaving the loaded model untouched
+            module = deepcopy(model.model.model).eval().cpu()
+            module.export()
+            module = module.to(dtype)
+            if args.int4:
+                print("🔢 Quantizing to INT8 activations / INT4 weights (TorchAO)...")
+                module = quantize_int8_int4(module)
+            export_executorch(module, torch.randn(1, 3, 432, 432, dtype=dtype), pte_path)
+        except Exception as e:
+            print(f"❌ Export failed: {e}")
+            import traceback
+            traceback.print_exc()
+            return 1
+
+        file_size_mb = os.path.getsize(pte_path) / (1024 * 1024)
+        print("✅ ExecuTorch export successful!")
+        print(f"📊 Model size: {file_size_mb:.2f} MB")
+        print("\n📚 Android runtime: https://pytorch.org/executorch/stable/using-executorch-android.html")
+        return 0
+
+    if args.quantize:
+        print("\n🔢 Quantizing to INT8 (QNNPACK)...")
+        model.model.model = quantize_int8(model.model.model.eval())
+        print("✅ Model quantized")
+
     # Optimize for inference (creates TorchScript traced model)
     print("\n⚡ Optimizing for inference...")
-    model.optimize_for_inference()
-    print("✅ Model optimized")
+    model.optimize_for_inference(dtype=dtype)
+    print(f"✅ Model optimized ({dtype})")
 
     # Get the traced model
     if hasattr(model, 'model') and hasattr(model.model, 'inference_model'):
@@ -39,19 +195,42 @@ def main():
         return 1
 
     # Export for mobile
-    mobile_path = os.path.join(OUTPUT_DIR, "rfdetr_nails_mobile.ptl")
+    # INT8 artifacts get their own name; live_inference_pytorch_mobile.py
+    # picks rfdetr_nails_int8.ptl up automatically when present
+    mobile_name = "rfdetr_nails_int8.ptl" if args.quantize else "rfdetr_nails_mobile.ptl"
+    mobile_path = os.path.join(OUTPUT_DIR, mobile_name)
     print(f"\n📤 Exporting to PyTorch Mobile: {mobile_path}")
 
     try:
         # Optimize for mobile
-        from torch.utils.mobile_optimizer import optimize_for_mobile
-
-        optimized_model = optimize_for_mobile(traced_model)
-
-        # Save
-        optimized_model._save_for_lite_interpreter(mobile_path)
-
-        print("✅ PyTorch Mobile export successful!")
+        from torch.utils.mobile_optimizer import optimize_for_mobile, MobileOptimizerType
+
+        # Hoisting conv packed params stores them a second time in the
+        # saved file, roughly doubling its size
+        blocklist = {MobileOptimizerType.HOIST_CONV_PACKED_PARAMS}
+        optimized_model = optimize_for_mobile(traced_model, optimization_blocklist=blocklist)
+
+        # optimize_for_mobile has been known to change outputs; check it
+        # against the traced model and back off if it does
+        check_input = torch.randn(1, 3, 432, 432, dtype=dtype,
+                                  generator=torch.Generator().manual_seed(0))
+        atol = 1e-2 if args.fp16 else 1e-3
+
+        if not outputs_match(traced_model, optimized_model, check_input, atol):
+            print("⚠️  Optimized outputs diverge; retrying without conv-bn fusion / prepack folding")
+            blocklist |= {MobileOptimizerType.CONV_BN_FUSION,
+                          MobileOptimizerType.INSERT_FOLD_PREPACK_OPS}
+            optimized_model = optimize_for_mobile(traced_model, optimization_blocklist=blocklist)
+
+        if outputs_match(traced_model, optimized_model, check_input, atol):
+            # Save as flatbuffer: no debug tables, mmap-able for faster cold load
+            optimized_model._save_for_lite_interpreter(mobile_path, _use_flatbuffer=True)
+            print("✅ PyTorch Mobile export successful!")
+        else:
+            # Same fallback as export_pytorch_mobile_simple.py
+            mobile_path = os.path.splitext(mobile_path)[0] + ".pt"
+            print(f"⚠️  Optimized outputs still diverge; saving unoptimized TorchScript: {mobile_path}")
+            torch.jit.save(traced_model, mobile_path)
 
         # Check file size
         file_size_mb = os.path.getsize(mobile_path) / (1024 * 1024)
@@ -59,10 +238,15 @@ def main():
 
         # Test the model
         print("\n🧪 Testing model...")
-        test_input = torch.randn(1, 3, 432, 432)
+        test_input = torch.randn(1, 3, 432, 432, dtype=dtype)
 
-        # Load mobile model
-        mobile_model = torch.jit.load(mobile_path)
+        # Load the file that ships: lite-interpreter flatbuffer, or the
+        # TorchScript fallback
+        if mobile_path.endswith(".ptl"):
+            from torch.jit.mobile import _load_for_lite_interpreter
+            mobile_model = _load_for_lite_interpreter(mobile_path)
+        else:
+            mobile_model = torch.jit.load(mobile_path)
 
         # Run inference
         import time
@@ -111,7 +295,7 @@ import org.pytorch.Tensor;
 import org.pytorch.torchvision.TensorImageUtils;
 
 // Load model
-Module model = Module.load(assetFilePath(this, "rfdetr_nails_mobile.ptl"));
+Module model = Module.load(assetFilePath(this, "%s"));
 
 // Prepare input (normalize to [0,1])
 Tensor inputTensor = TensorImageUtils.bitmapToFloat32Tensor(
@@ -126,7 +310,7 @@ Tensor[] outputs = model.forward(IValue.from(inputTensor)).toTuple();
 // Process outputs
 // outputs[14] contains masks (1, 200, 108, 108)
 // outputs[0-12] contain detection outputs
-""")
+""" % os.path.basename(mobile_path))
 
         print("\n4️⃣ Preprocessing image:")
         print("""
@@ -6,11 +6,20 @@ Simpler approach without mobile-specific optimizations
 import torch
 import os
 import sys
+import argparse
 
 CHECKPOINT_PATH = "/home/usama-naveed/nail_AR-rfdeter/output/checkpoint_best_total.pth"
 OUTPUT_DIR = "./pytorch_mobile_models"
 
 def main():
+    parser = argparse.ArgumentParser(description='Export RF-DETR to TorchScript')
+    parser.add_argument('--fp16', action='store_true',
+                        help='Export FP16 weights (expects FP16 input)')
+    parser.add_argument('--freeze', action='store_true',
+                        help='Freeze and constant-fold the graph (pins the export device/dtype)')
+    args = parser.parse_args()
+    dtype = torch.float16 if args.fp16 else torch.float32
+
     print("\n" + "="*60)
     print("RF-DETR to PyTorch Mobile (Simple Export)")
     print("="*60 + "\n")
@@ -26,8 +35,8 @@ def main():
 
     # Optimize for inference
     print("\n⚡ Optimizing for inference...")
-    model.optimize_for_inference()
-    print("✅ Model optimized with TorchScript")
+    model.optimize_for_inference(dtype=dtype)
+    print(f"✅ Model optimized with TorchScript ({dtype})")
 
     # Get the traced model
     if hasattr(model, 'model') and hasattr(model.model, 'inference_model'):
@@ -37,6 +46,15 @@ def main():
         print("❌ Could not get traced model")
         return 1
 
+    # Freezing inlines the weights as graph constants, so a frozen model can
+    # no longer be moved with .to(device/dtype) after loading - opt-in only
+    if args.freeze:
+        print("\n🧊 Freezing graph...")
+        traced_model = torch.jit.freeze(traced_model.eval())
+        traced_model = torch.jit.optimize_for_inference(traced_model)
+        torch._C._jit_pass_remove_mutation(traced_model.graph)
+        print("✅ Graph frozen and constant-folded")
+
     # Save directly (without mobile optimization)
     output_path = os.path.join(OUTPUT_DIR, "rfdetr_nails.pt")
     print(f"\n📤 Saving model: {output_path}")
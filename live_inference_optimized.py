@@ -4,6 +4,7 @@ Multiple optimizations to reduce inference latency
 """
 
 import torch
+import torch.nn.functional as F
 import cv2
 import numpy as np
 from PIL import Image
@@ -11,10 +12,19 @@ import time
 import argparse
 from collections import deque
 
+from pipeline_utils import ThreadedCapture
+
 MODEL_PATH = "./pytorch_mobile_models/rfdetr_nails.pt"
 
+# The model is always fed 1x3x432x432, so there is nothing for the profiling
+# executor to learn; it only adds re-profiling/recompile stalls on the first
+# calls. Use the legacy executor and a single static fusion specialization.
+torch._C._jit_set_profiling_executor(False)
+torch._C._jit_set_profiling_mode(False)
+torch.jit.set_fusion_strategy([("STATIC", 1)])
+
 class NailSegmentationOptimized:
-    def __init__(self, model_path, confidence_threshold=0.2, input_size=432):
+    def __init__(self, model_path, confidence_threshold=0.2, input_size=432, bf16=False):
         """Initialize with optimizations"""
         print(f"📦 Loading PyTorch Mobile model from: {model_path}")
 
@@ -22,11 +32,29 @@ class NailSegmentationOptimized:
             self.model = torch.jit.load(model_path)
             self.model.eval()
 
+            # NHWC lets oneDNN/XNNPACK pick their native conv kernels
+            torch.backends.mkldnn.enabled = True
+            self.device = "cuda" if torch.cuda.is_available() else "cpu"
+
+            # Weights and inputs stay FP32; with bf16 the CPU forward runs
+            # under BF16 autocast (AVX512-BF16/AMX). CUDA keeps FP32 for
+            # graph replay.
+            self.dtype = torch.float32
+            self.bf16 = bf16 and self.device == "cpu"
+            self.model = self.model.to(self.device, memory_format=torch.channels_last)
+
+            # Fold constants (conv-bn, dropout) into the graph once at load,
+            # for the final device/dtype; already-frozen models are used as-is
+            try:
+                self.model = torch.jit.optimize_for_inference(torch.jit.freeze(self.model))
+            except RuntimeError as e:
+                print(f"⚠️  Graph freezing skipped: {e}")
+
             # Enable optimizations
             torch.set_num_threads(4)  # Use multiple CPU threads
-            torch.set_grad_enabled(False)  # Disable gradient computation
 
-            print("✅ Model loaded with optimizations")
+            precision = "bf16 autocast" if self.bf16 else self.dtype
+            print(f"✅ Model loaded with optimizations ({self.device}, {precision})")
         except Exception as e:
             print(f"❌ Failed to load model: {e}")
             raise
@@ -42,28 +70,58 @@ class NailSegmentationOptimized:
 
         # Warmup model
         print("🔥 Warming up model...")
-        dummy = torch.randn(1, 3, 432, 432)
-        for _ in range(3):
-            _ = self.model(dummy)
+        dummy = torch.randn(1, 3, 432, 432, device=self.device, dtype=self.dtype).contiguous(
+            memory_format=torch.channels_last
+        )
+        # Production shape only, so the graph specializes exactly once
+        with torch.inference_mode(), torch.jit.optimized_execution(True), \
+                torch.autocast("cpu", dtype=torch.bfloat16, enabled=self.bf16):
+            for _ in range(3):
+                _ = self.model(dummy)
         print("✅ Model warmed up")
 
+        # Fixed input shape: on CUDA, replay the whole forward as one graph
+        self._graph = None
+        if self.device == "cuda":
+            self._capture_graph(dummy)
+
         # Colors for visualization
         self.colors = [
             (255, 0, 0), (0, 255, 0), (0, 0, 255),
             (255, 255, 0), (255, 0, 255), (0, 255, 255),
         ]
 
+        # Per-color blend scalars (0.4 * color): a masked in-place cv2.add
+        # with these equals addWeighted against a zero-filled colored mask,
+        # without allocating one per detection
+        self._blend_colors = [tuple(0.4 * c for c in color) + (0.0,) for color in self.colors]
+
+        # Preallocated channels_last model input (an NHWC buffer viewed as
+        # NCHW); preprocess() writes every frame into it. Pinned on CUDA so
+        # the host-to-device copy can run async.
+        self._input = torch.empty(
+            (1, 432, 432, 3), dtype=self.dtype, pin_memory=self.device == "cuda"
+        ).permute(0, 3, 1, 2)
+        self._input_chw = self._input[0]
+
+        # uint8 BGR resize target and its CHW view; the channel swap and
+        # float conversion happen only in the final multiply
+        self._resized = np.empty((432, 432, 3), dtype=np.uint8)
+        self._bgr_chw = torch.from_numpy(self._resized).permute(2, 0, 1)
+
         # Performance tracking
         self.inference_times = deque(maxlen=30)
 
-        # Frame skipping
-        self.frame_skip = 1  # Process every N frames
-        self.frame_count = 0
-        self.last_overlay = None
-
     def preprocess(self, frame):
-        """Optimized preprocessing"""
-        # First downsample camera frame if needed (reduces initial processing)
+        """
+        Optimized preprocessing.
+
+        Returns the preallocated input tensor, overwritten on every call.
+        """
+        if self.device == "cuda":
+            return self._preprocess_gpu(frame)
+
+        # Optional camera downsample (only when explicitly requested)
         if self.camera_downsample < 432:
             frame = cv2.resize(
                 frame,
@@ -71,33 +129,77 @@ class NailSegmentationOptimized:
                 interpolation=cv2.INTER_AREA
             )
 
-        # Then resize to model input size (432×432)
-        resized = cv2.resize(
+        # Resize to model input size (432×432)
+        cv2.resize(
             frame,
             (432, 432),
+            dst=self._resized,
             interpolation=cv2.INTER_AREA  # INTER_AREA is fastest for downscaling
         )
 
-        # Convert BGR to RGB and normalize in one go
-        rgb_normalized = cv2.cvtColor(resized, cv2.COLOR_BGR2RGB).astype(np.float32) / 255.0
-
-        # Transpose to CHW format
-        img_array = np.transpose(rgb_normalized, (2, 0, 1))
-
-        # Convert to tensor
-        img_tensor = torch.from_numpy(img_array).unsqueeze(0)
+        # BGR→RGB, uint8→float and /255 in one walk over the pixels: each
+        # output channel is a multithreaded torch kernel reading the opposite
+        # BGR channel, written straight into the input buffer
+        for c in range(3):
+            torch.mul(self._bgr_chw[2 - c], 1.0 / 255.0, out=self._input_chw[c])
+
+        return self._input
+
+    @torch.inference_mode()
+    def _preprocess_gpu(self, frame):
+        """
+        CUDA path: upload the raw uint8 frame and resize, swap channels and
+        normalize on the device, so 1 byte/pixel crosses the bus instead of
+        the float input, and the result never leaves the device.
+        """
+        frame_gpu = torch.from_numpy(frame).to(self.device, non_blocking=True)
+        x = frame_gpu.permute(2, 0, 1).unsqueeze(0).flip(1).to(self.dtype)  # BGR→RGB
+        x = F.interpolate(x, size=(432, 432), mode="area")
+        return x.mul_(1.0 / 255.0).contiguous(memory_format=torch.channels_last)
+
+    @torch.inference_mode()
+    def _capture_graph(self, example):
+        """
+        Capture the forward pass into a CUDA graph.
+
+        Each frame is then copied into the static input and replayed with a
+        single launch instead of hundreds of per-kernel launches. Falls back
+        to eager CUDA execution if the model cannot be captured.
+        """
+        self._static_input = example.clone(memory_format=torch.channels_last)
+
+        # Capture must follow warmup on a side stream
+        stream = torch.cuda.Stream()
+        stream.wait_stream(torch.cuda.current_stream())
+        with torch.cuda.stream(stream):
+            for _ in range(3):
+                self.model(self._static_input)
+        torch.cuda.current_stream().wait_stream(stream)
+
+        graph = torch.cuda.CUDAGraph()
+        try:
+            with torch.cuda.graph(graph):
+                self._static_output = self.model(self._static_input)
+        except RuntimeError as e:
+            print(f"⚠️  CUDA graph capture failed, running eagerly: {e}")
+            return
 
-        return img_tensor
+        self._graph = graph
+        print("✅ CUDA graph captured")
 
+    @torch.inference_mode()
     def inference(self, img_tensor):
         """Run optimized inference"""
         start_time = time.time()
 
         # Run inference
-        outputs = self.model(img_tensor)
-
-        inference_time = (time.time() - start_time) * 1000
-        self.inference_times.append(inference_time)
+        if self._graph is not None:
+            self._static_input.copy_(img_tensor, non_blocking=True)
+            self._graph.replay()
+            outputs = self._static_output
+        else:
+            with torch.autocast("cpu", dtype=torch.bfloat16, enabled=self.bf16):
+                outputs = self.model(img_tensor.to(self.device, non_blocking=True))
 
         # Extract outputs
         if isinstance(outputs, tuple):
@@ -108,59 +210,80 @@ class NailSegmentationOptimized:
             mask_tensor = outputs
             scores = None
 
+        # Scores are tiny, so they go to the host (FP32) right away; that
+        # also syncs the device so the timing below covers the forward
+        # pass. Masks stay put until postprocess has filtered them.
+        if scores is not None:
+            scores = scores.float().cpu()
+        elif self.device == "cuda":
+            torch.cuda.synchronize()
+
+        inference_time = (time.time() - start_time) * 1000
+        self.inference_times.append(inference_time)
+
         return mask_tensor, scores, inference_time
 
     def postprocess_fast(self, mask_tensor, scores, original_frame):
         """Faster post-processing with optimizations"""
-        # Get mask data
-        masks = mask_tensor.squeeze(0).numpy()
-        num_detections, mask_h, mask_w = masks.shape
+        # Mask tensor may still be on the device / in BF16
+        masks = mask_tensor.squeeze(0)
+        num_detections = masks.shape[0]
 
         frame_h, frame_w = original_frame.shape[:2]
 
-        # Get confidence scores
+        # Pre-filter detections by confidence on the score tensor, so only
+        # the surviving masks are copied to the host
         if scores is not None:
-            class_scores = scores.squeeze(0).numpy()
-            confidence_scores = class_scores[:, 1]
+            confidence_scores = scores[0, :, 1]
+            valid_indices = (confidence_scores > self.confidence_threshold).nonzero(as_tuple=True)[0]
+            confidences = confidence_scores[valid_indices].tolist()
         else:
-            confidence_scores = None
-
-        # Pre-filter detections by confidence (faster)
-        if confidence_scores is not None:
-            valid_indices = np.where(confidence_scores > self.confidence_threshold)[0]
-        else:
-            valid_indices = range(min(10, num_detections))  # Process max 10 detections
+            valid_indices = torch.arange(min(10, num_detections))  # Process max 10 detections
+            confidences = [1.0] * len(valid_indices)
 
         overlay = original_frame.copy()
         detected_nails = 0
 
-        for idx in valid_indices:
-            mask = masks[idx]
-            confidence = confidence_scores[idx] if confidence_scores is not None else 1.0
+        if len(valid_indices) == 0:
+            return overlay, detected_nails
 
-            # Resize mask (use INTER_NEAREST for speed)
-            mask_resized = cv2.resize(
-                mask,
-                (frame_w, frame_h),
-                interpolation=cv2.INTER_NEAREST
-            )
+        masks_valid = masks[valid_indices.to(masks.device)].float().cpu()
+
+        # Resize + threshold all candidate masks in one batched call
+        binary = F.interpolate(
+            masks_valid.unsqueeze(1),
+            size=(frame_h, frame_w),
+            mode="nearest"
+        ).squeeze(1) > 0.5
+
+        # Areas and centroids of all masks at once (replaces per-mask
+        # np.sum and cv2.moments): row/column pixel counts dotted with
+        # the pixel coordinates
+        areas = binary.sum(dim=(1, 2))
+        row_counts = binary.sum(dim=2, dtype=torch.float32)
+        col_counts = binary.sum(dim=1, dtype=torch.float32)
+        safe_areas = areas.clamp(min=1)
+        cys = (row_counts @ torch.arange(frame_h, dtype=torch.float32)) / safe_areas
+        cxs = (col_counts @ torch.arange(frame_w, dtype=torch.float32)) / safe_areas
 
-            # Threshold mask
-            binary_mask = (mask_resized > 0.5).astype(np.uint8)
+        binary_masks = binary.numpy().view(np.uint8)
+        areas = areas.numpy()
+        centroids = torch.stack((cxs, cys), dim=1).to(torch.int32).numpy()
+
+        for i, confidence in enumerate(confidences):
+            binary_mask = binary_masks[i]
 
             # Skip if mask is too small
-            if np.sum(binary_mask) < 100:
+            if areas[i] < 100:
                 continue
 
             detected_nails += 1
 
-            # Create colored mask
-            color = self.colors[detected_nails % len(self.colors)]
-            colored_mask = np.zeros_like(original_frame)
-            colored_mask[binary_mask == 1] = color
+            color_idx = detected_nails % len(self.colors)
+            color = self.colors[color_idx]
 
-            # Blend
-            overlay = cv2.addWeighted(overlay, 1, colored_mask, 0.4, 0)
+            # Blend (in place, masked pixels only)
+            cv2.add(overlay, self._blend_colors[color_idx], dst=overlay, mask=binary_mask)
 
             # Draw contours (simplified)
             contours, _ = cv2.findContours(
@@ -173,16 +296,13 @@ class NailSegmentationOptimized:
                 cv2.drawContours(overlay, contours, -1, color, 2)
 
                 # Draw confidence
-                M = cv2.moments(contours[0])
-                if M["m00"] != 0:
-                    cx = int(M["m10"] / M["m00"])
-                    cy = int(M["m01"] / M["m00"])
-                    cv2.putText(
-                        overlay, f"{confidence:.2f}",
-                        (cx - 20, cy),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5,
-                        (255, 255, 255), 2, cv2.LINE_AA
-                    )
+                cx, cy = centroids[i]
+                cv2.putText(
+                    overlay, f"{confidence:.2f}",
+                    (int(cx) - 20, int(cy)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5,
+                    (255, 255, 255), 2, cv2.LINE_AA
+                )
 
         return overlay, detected_nails
 
@@ -206,23 +326,27 @@ def main():
                         help='Process every N frames (2=half speed, faster)')
     parser.add_argument('--threads', type=int, default=4,
                         help='Number of CPU threads for inference')
+    parser.add_argument('--bf16', action='store_true',
+                        help='BF16 autocast for CPU inference (AVX512-BF16/AMX)')
     args = parser.parse_args()
 
     print("\n" + "="*60)
     print("⚡ OPTIMIZED Live Nail Segmentation")
     print("="*60 + "\n")
 
-    # Set thread count
+    # Set thread count (OpenCV's resize/blend kernels split work into
+    # row stripes across the same number of threads)
     torch.set_num_threads(args.threads)
+    cv2.setNumThreads(args.threads)
 
     # Initialize
     try:
         segmentation = NailSegmentationOptimized(
             args.model,
             args.threshold,
-            args.camera_size
+            args.camera_size,
+            bf16=args.bf16
         )
-        segmentation.frame_skip = args.skip_frames
     except Exception as e:
         print(f"❌ Failed to initialize: {e}")
         return 1
@@ -241,6 +365,9 @@ def main():
     cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # Reduce buffer for lower latency
 
     print(f"✅ Camera opened")
+
+    # Capture on a background thread so camera I/O overlaps inference
+    cap = ThreadedCapture(cap, skip=args.skip_frames)
     print("\n" + "="*60)
     print("OPTIMIZATIONS ENABLED:")
     print(f"  • Model input: 432×432 (fixed)")
@@ -266,39 +393,31 @@ def main():
             if not ret:
                 break
 
-            total_frames += 1
+            # Skipped frames are dropped in the capture thread (grab only)
+            total_frames += cap.skip
 
             if not paused:
-                # Frame skipping logic
-                should_process = (total_frames % segmentation.frame_skip == 0)
-
-                if should_process:
-                    frame_num += 1
-
-                    # Preprocess
-                    img_tensor = segmentation.preprocess(frame)
+                frame_num += 1
 
-                    # Inference
-                    mask_tensor, scores, inference_time = segmentation.inference(img_tensor)
+                # Preprocess
+                img_tensor = segmentation.preprocess(frame)
 
-                    # Post-process
-                    overlay, num_nails = segmentation.postprocess_fast(mask_tensor, scores, frame)
+                # Inference
+                mask_tensor, scores, inference_time = segmentation.inference(img_tensor)
 
-                    segmentation.last_overlay = overlay
-                else:
-                    # Reuse last result
-                    overlay = segmentation.last_overlay if segmentation.last_overlay is not None else frame
+                # Post-process
+                overlay, num_nails = segmentation.postprocess_fast(mask_tensor, scores, frame)
 
                 # Add info
                 avg_fps = segmentation.get_avg_fps()
-                effective_fps = avg_fps / segmentation.frame_skip if segmentation.frame_skip > 0 else avg_fps
+                effective_fps = avg_fps / cap.skip
 
                 info = [
                     f"Inference: {segmentation.inference_times[-1] if segmentation.inference_times else 0:.1f}ms",
                     f"FPS: {avg_fps:.1f}",
                     f"Effective FPS: {effective_fps:.1f}",
-                    f"Nails: {num_nails if should_process else '...'}",
-                    f"Skip: 1/{segmentation.frame_skip}",
+                    f"Nails: {num_nails}",
+                    f"Skip: 1/{cap.skip}",
                 ]
 
                 y = 30
@@ -339,8 +458,8 @@ def main():
                 segmentation.confidence_threshold = max(0.0, segmentation.confidence_threshold - 0.05)
                 print(f"Threshold: {segmentation.confidence_threshold:.2f}")
             elif key == ord('f'):
-                segmentation.frame_skip = 1 if segmentation.frame_skip > 1 else 2
-                print(f"Frame skip: 1/{segmentation.frame_skip}")
+                cap.skip = 1 if cap.skip > 1 else 2
+                print(f"Frame skip: 1/{cap.skip}")
 
     except KeyboardInterrupt:
         print("\n⚠️ Interrupted")
@@ -9,9 +9,16 @@ import numpy as np
 from PIL import Image
 import time
 import argparse
+import threading
+from collections import deque
+
+from pipeline_utils import ThreadedCapture, InferenceWorker, StaticTextLayer
 
 CHECKPOINT_PATH = "/home/usama-naveed/nail_AR-rfdeter/output/checkpoint_best_total.pth"
 
+# Run the display path (HUD text, imshow) through OpenCL when present
+USE_UMAT = cv2.ocl.haveOpenCL()
+
 class NailSegmentationOriginal:
     def __init__(self, checkpoint_path, confidence_threshold=0.5):
         """Initialize with original RF-DETR model"""
@@ -39,8 +46,16 @@ class NailSegmentationOriginal:
             (0, 255, 255),  # Yellow
         ]
 
+        # Per-color blend scalars (0.4 * color): a masked in-place cv2.add
+        # with these equals addWeighted against a zero-filled colored mask
+        self._blend_colors = [tuple(0.4 * c for c in color) + (0.0,) for color in self.colors]
+
+        # Overlay buffer reused across frames, sized on the first frame
+        self._overlay_buf = None
+
         # Performance tracking
-        self.inference_times = []
+        self.inference_times = deque(maxlen=30)
+        self._inference_sum_ms = 0.0  # running sum of inference_times
 
     def process_frame(self, frame):
         """Process a single frame"""
@@ -53,65 +68,99 @@ class NailSegmentationOriginal:
         detections = self.model.predict(pil_image, threshold=self.confidence_threshold)
         inference_time = (time.time() - start_time) * 1000
 
+        if len(self.inference_times) == self.inference_times.maxlen:
+            self._inference_sum_ms -= self.inference_times[0]
         self.inference_times.append(inference_time)
-        if len(self.inference_times) > 30:
-            self.inference_times.pop(0)
+        self._inference_sum_ms += inference_time
 
         return detections, inference_time
 
     def visualize(self, frame, detections):
         """Visualize detections on frame"""
-        overlay = frame.copy()
+        if self._overlay_buf is None or self._overlay_buf.shape != frame.shape:
+            self._overlay_buf = np.empty_like(frame)
+        overlay = self._overlay_buf
+        np.copyto(overlay, frame)
 
         if detections.mask is None or len(detections) == 0:
             return overlay, 0
 
         frame_h, frame_w = frame.shape[:2]
 
+        # Detection index (+1) per pixel, so one labelling pass serves every nail
+        owners = np.zeros((frame_h, frame_w), dtype=np.uint16)
+        confidences = {}
+
         for i in range(len(detections)):
             mask = detections.mask[i]
             confidence = detections.confidence[i]
 
             if confidence > self.confidence_threshold:
-                # Resize mask to frame size
-                mask_h, mask_w = mask.shape
+                # Threshold at mask resolution into a uint8 0/255 mask, then
+                # resize in uint8 (no float copies). For RF-DETR's boolean
+                # masks this equals resizing in float and thresholding at 0.5
+                small = (mask > 0.5).view(np.uint8) * np.uint8(255)
                 mask_resized = cv2.resize(
-                    mask.astype(np.float32),
+                    small,
                     (frame_w, frame_h),
                     interpolation=cv2.INTER_LINEAR
                 )
+                binary_mask = cv2.compare(mask_resized, 127, cv2.CMP_GT)
+
+                # Blend with overlay (in place, masked pixels only)
+                color_idx = i % len(self.colors)
+                cv2.add(overlay, self._blend_colors[color_idx], dst=overlay, mask=binary_mask)
+
+                owners[binary_mask > 0] = i + 1
+                confidences[i + 1] = confidence
 
-                # Threshold mask
-                binary_mask = (mask_resized > 0.5).astype(np.uint8)
+        if not confidences:
+            return overlay, len(detections)
 
-                # Create colored mask
-                color = self.colors[i % len(self.colors)]
-                colored_mask = np.zeros_like(frame)
-                colored_mask[binary_mask == 1] = color
+        # Single full-frame pass for area, bbox and centroid of every blob
+        union = cv2.compare(owners, 0, cv2.CMP_GT)
+        num, labels, stats, centroids = cv2.connectedComponentsWithStats(union, 8, cv2.CV_32S)
 
-                # Blend with overlay
-                overlay = cv2.addWeighted(overlay, 1, colored_mask, 0.4, 0)
+        for k in range(1, num):
+            if stats[k, cv2.CC_STAT_AREA] < 100:
+                continue
 
-                # Draw contours
+            x = stats[k, cv2.CC_STAT_LEFT]
+            y = stats[k, cv2.CC_STAT_TOP]
+            w = stats[k, cv2.CC_STAT_WIDTH]
+            h = stats[k, cv2.CC_STAT_HEIGHT]
+            crop = np.where(labels[y:y+h, x:x+w] == k, owners[y:y+h, x:x+w], 0)
+
+            # Touching nails share a blob, so split it back by detection
+            blob_owners = np.unique(crop[crop > 0])
+            for owner in blob_owners:
+                owner_mask = cv2.compare(crop, int(owner), cv2.CMP_EQ)
+
+                # Contours only over the blob's bounding box
                 contours, _ = cv2.findContours(
-                    binary_mask,
+                    owner_mask,
                     cv2.RETR_EXTERNAL,
-                    cv2.CHAIN_APPROX_SIMPLE
+                    cv2.CHAIN_APPROX_SIMPLE,
+                    offset=(int(x), int(y))
                 )
+                color = self.colors[(int(owner) - 1) % len(self.colors)]
                 cv2.drawContours(overlay, contours, -1, color, 2)
 
                 # Draw confidence
-                if len(contours) > 0:
-                    M = cv2.moments(contours[0])
-                    if M["m00"] != 0:
-                        cx = int(M["m10"] / M["m00"])
-                        cy = int(M["m01"] / M["m00"])
-                        cv2.putText(
-                            overlay, f"{confidence:.2f}",
-                            (cx - 20, cy),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.5,
-                            (255, 255, 255), 2, cv2.LINE_AA
-                        )
+                if len(blob_owners) == 1:
+                    cx, cy = centroids[k]
+                else:
+                    M = cv2.moments(owner_mask, binaryImage=True)
+                    if M["m00"] == 0:
+                        continue
+                    cx = x + M["m10"] / M["m00"]
+                    cy = y + M["m01"] / M["m00"]
+                cv2.putText(
+                    overlay, f"{confidences[int(owner)]:.2f}",
+                    (int(cx) - 20, int(cy)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5,
+                    (255, 255, 255), 2, cv2.LINE_AA
+                )
 
         return overlay, len(detections)
 
@@ -119,7 +168,7 @@ class NailSegmentationOriginal:
         """Get average FPS"""
         if not self.inference_times:
             return 0
-        avg_time = sum(self.inference_times) / len(self.inference_times)
+        avg_time = self._inference_sum_ms / len(self.inference_times)
         return 1000 / avg_time if avg_time > 0 else 0
 
 def main():
@@ -129,8 +178,12 @@ def main():
     parser.add_argument('--threshold', type=float, default=0.5, help='Confidence threshold')
     parser.add_argument('--width', type=int, default=640, help='Camera width')
     parser.add_argument('--height', type=int, default=480, help='Camera height')
+    parser.add_argument('--threads', type=int, default=4, help='Number of OpenCV threads')
     args = parser.parse_args()
 
+    # Per-mask resizes and blends are split into row stripes across threads
+    cv2.setNumThreads(args.threads)
+
     print("\n" + "="*60)
     print("Live Nail Segmentation with RF-DETR (Original)")
     print("="*60 + "\n")
@@ -154,6 +207,13 @@ def main():
     cap.set(cv2.CAP_PROP_FRAME_HEIGHT, args.height)
 
     print(f"✅ Camera opened")
+
+    # Capture and inference run as background pipeline stages;
+    # visualization and display stay on the main thread
+    stop_event = threading.Event()
+    capture = ThreadedCapture(cap, stop_event)
+    worker = InferenceWorker(segmentation.process_frame, capture, stop_event, num_outputs=2)
+
     print("\n" + "="*60)
     print("CONTROLS:")
     print("  'q' or 'ESC' - Quit")
@@ -165,29 +225,43 @@ def main():
     paused = False
     frame_count = 0
 
+    # Static HUD text (threshold line, watermark), re-rasterized on change
+    hud_static = StaticTextLayer(350, 130, (0, 255, 0))
+    watermark = StaticTextLayer(350, 30, (255, 255, 255))
+    watermark.update([("RF-DETR (Python)", (10, 20), 0.5, 1)])
+
+    # Dynamic HUD line templates, formatted into a reused list each frame
+    info_fmt = ("FPS: %.1f", "Inference: %.1fms", "Nails: %d")
+    info = [""] * len(info_fmt)
+
     try:
         while True:
-            if not paused:
-                ret, frame = cap.read()
-                if not ret:
-                    break
+            # Keep draining the pipeline while paused so it stays live
+            ret, frame, detections, inference_time = worker.read()
+            if not ret:
+                break
 
+            if not paused:
                 frame_count += 1
 
-                # Process frame
-                detections, inference_time = segmentation.process_frame(frame)
-
                 # Visualize
                 overlay, num_nails = segmentation.visualize(frame, detections)
 
                 # Add info text
                 avg_fps = segmentation.get_avg_fps()
-                info = [
-                    f"FPS: {avg_fps:.1f}",
-                    f"Inference: {inference_time:.1f}ms",
-                    f"Nails: {num_nails}",
+                for i, value in enumerate((avg_fps, inference_time, num_nails)):
+                    info[i] = info_fmt[i] % value
+
+                # Threshold line from the cached layer, the rest drawn live
+                hud_static.update([(
                     f"Threshold: {segmentation.confidence_threshold:.2f}",
-                ]
+                    (10, 120), 0.7, 2
+                )])
+                hud_static.draw(overlay)
+                watermark.draw(overlay, 0, overlay.shape[0] - 30)
+
+                if USE_UMAT:
+                    overlay = cv2.UMat(overlay)
 
                 y = 30
                 for text in info:
@@ -198,13 +272,6 @@ def main():
                     )
                     y += 30
 
-                cv2.putText(
-                    overlay, "RF-DETR (Python)",
-                    (10, overlay.shape[0] - 10),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.5,
-                    (255, 255, 255), 1, cv2.LINE_AA
-                )
-
                 display_frame = overlay
 
             cv2.imshow('Nail Segmentation - RF-DETR', display_frame)
@@ -231,7 +298,7 @@ def main():
         print("\n⚠️ Interrupted")
 
     finally:
-        cap.release()
+        capture.release()
         cv2.destroyAllWindows()
 
         print("\n" + "="*60)
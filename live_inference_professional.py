@@ -8,11 +8,14 @@ Supports both GUI and headless modes:
 """
 
 import torch
+import torch.nn.functional as F
 import cv2
 import numpy as np
 from PIL import Image
 import time
 import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from collections import deque
 import sys
 import os
@@ -24,15 +27,31 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'professional_nail_re
 from professional_nail_renderer.nail_geometry import NailGeometryAnalyzer
 from professional_nail_renderer.nail_material import NailMaterial, MaterialPresets, MaterialFinish
 from professional_nail_renderer.photo_realistic_renderer import PhotoRealisticNailRenderer
+from pipeline_utils import ThreadedCapture, InferenceWorker, StaticTextLayer
 
 MODEL_PATH = "./pytorch_mobile_models/rfdetr_nails.pt"
 
+# Run the display path (HUD text, imshow) through OpenCL when present
+USE_UMAT = cv2.ocl.haveOpenCL()
 
-def detect_display():
+
+def detect_display(verify=False):
     """
     Detect if display/GUI is available.
-    Returns True if cv2.imshow() will work, False for headless environment.
+    Returns True if cv2.imshow() should work, False for headless environment.
+
+    Checks the environment only, which avoids initializing the GUI backend.
+    Pass verify=True to confirm with a throwaway window (e.g. for
+    opencv-python-headless builds that have no GUI support at all).
     """
+    has_display = bool(
+        os.environ.get('DISPLAY')
+        or os.environ.get('WAYLAND_DISPLAY')
+        or sys.platform in ('darwin', 'win32')
+    )
+    if not has_display or not verify:
+        return has_display
+
     try:
         # Try to create and destroy a test window
         test_img = np.zeros((100, 100, 3), dtype=np.uint8)
@@ -41,26 +60,60 @@ def detect_display():
         cv2.destroyWindow('__test__')
         cv2.waitKey(1)
         return True
-    except:
+    except cv2.error:
         return False
 
 
+class AsyncFrameWriter:
+    """
+    JPEG encode + disk write on a small thread pool, off the render loop.
+
+    At most max_in_flight frames are queued; save() blocks beyond that so
+    a slow disk applies backpressure instead of growing memory.
+    """
+
+    def __init__(self, max_workers=2, max_in_flight=4, quality=85):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._in_flight = threading.BoundedSemaphore(max_in_flight)
+        self._params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+
+    def save(self, frame, path, message=None):
+        """Queue a copy of frame for writing to path; message is printed once saved"""
+        self._in_flight.acquire()
+        self._executor.submit(self._save_jpeg, frame.copy(), Path(path), message)
+
+    def _save_jpeg(self, frame, path, message):
+        try:
+            ok, encoded = cv2.imencode('.jpg', frame, self._params)
+            if ok:
+                path.write_bytes(encoded.tobytes())
+                if message:
+                    print(message)
+            else:
+                print(f"⚠️ Failed to encode {path.name}")
+        finally:
+            self._in_flight.release()
+
+    def close(self):
+        """Wait for pending writes to finish"""
+        self._executor.shutdown(wait=True)
+
+
 class ProfessionalNailAR:
     def __init__(
         self,
         model_path,
         confidence_threshold=0.2,
-        material_preset="glossy_red"
+        material_preset="glossy_red",
+        bf16=False
     ):
         """Initialize professional nail AR system"""
-        print(f"📦 Loading PyTorch Mobile model from: {model_path}")
-
         try:
-            self.model = torch.jit.load(model_path)
-            self.model.eval()
+            self.model_path = model_path
+            self._load_model(model_path, bf16)
             torch.set_num_threads(4)
             torch.set_grad_enabled(False)
-            print("✅ Model loaded")
+            print(f"✅ Model loaded ({self.device}, {self.dtype})")
         except Exception as e:
             print(f"❌ Failed to load model: {e}")
             raise
@@ -91,37 +144,194 @@ class ProfessionalNailAR:
 
         print(f"💅 Material: {self.preset_names[self.current_preset_idx]}")
 
-        # Warmup
+        # Preallocated model input, an NHWC buffer viewed as channels_last
+        # NCHW; preprocess() overwrites it every frame. Pinned on CUDA so
+        # the host-to-device copy can run async.
+        self._resized = np.empty((432, 432, 3), dtype=np.uint8)
+        self._bgr_chw = torch.from_numpy(self._resized).permute(2, 0, 1)
+        self._input = torch.empty(
+            (1, 432, 432, 3), pin_memory=self.device == "cuda"
+        ).permute(0, 3, 1, 2)
+
+        # Render output buffer, sized on the first frame
+        self._overlay_buf = None
+
+        # Performance tracking
+        self.inference_times = deque(maxlen=30)
+        self.render_times = deque(maxlen=30)
+
+        # Warmup (through inference() so the dtype/layout casts are covered)
         print("🔥 Warming up model...")
         dummy = torch.randn(1, 3, 432, 432)
         for _ in range(3):
-            _ = self.model(dummy)
+            _ = self.inference(dummy)
+        self.inference_times.clear()
         print("✅ Model warmed up")
 
-        # Performance tracking
-        self.inference_times = deque(maxlen=30)
-        self.render_times = deque(maxlen=30)
+    def warmup_pipeline(self, frame_shape, iterations=2):
+        """
+        Run preprocess, inference and the full render path on synthetic
+        data at the camera resolution, so first-use costs (resize/interp
+        kernels, allocator growth, output buffers, material LUTs) are paid
+        before the live loop instead of on its first frames.
+        """
+        print("🔥 Warming up render pipeline...")
+        fake_bgr = np.zeros(frame_shape, dtype=np.uint8)
+
+        # One confident detection with a nail-sized blob so geometry
+        # analysis and shading actually run
+        blob = np.zeros((108, 108), dtype=np.float32)
+        cv2.ellipse(blob, (54, 54), (18, 30), 0, 0, 360, 1.0, -1)
+        fake_mask = torch.zeros(1, 200, 108, 108, device=self.device)
+        fake_mask[0, 0] = torch.from_numpy(blob)
+        fake_scores = torch.zeros(1, 200, 2)
+        fake_scores[0, 0, 1] = 0.9
+
+        for _ in range(iterations):
+            self.inference(self.preprocess(fake_bgr))
+            self.render_professional(fake_mask, fake_scores, fake_bgr)
+
+        self.inference_times.clear()
+        self.render_times.clear()
+        print("✅ Pipeline warmed up")
+
+    def _load_model(self, model_path, bf16):
+        """Load the TorchScript model; sets self.model, self.device, self.dtype"""
+        print(f"📦 Loading PyTorch Mobile model from: {model_path}")
+        self.model = torch.jit.load(model_path)
+        self.model.eval()
+
+        # Half precision: FP16 on CUDA, BF16 on CPU when requested
+        # (AVX512-BF16/AMX); NHWC for the conv backbone
+        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        if self.device == "cuda":
+            self.dtype = torch.float16
+        else:
+            self.dtype = torch.bfloat16 if bf16 else torch.float32
+        self.model = self.model.to(
+            self.device, dtype=self.dtype, memory_format=torch.channels_last
+        )
+
+        # Fold constants for the final device/dtype; already-frozen
+        # models are used as-is
+        try:
+            self.model = torch.jit.freeze(self.model)
+        except RuntimeError as e:
+            print(f"⚠️  Graph freezing skipped: {e}")
+
+    def quantize(self, mode, frames, min_iou=0.99):
+        """
+        INT8-quantize the model for CPU inference (TorchScript graph mode).
+
+        "dynamic" quantizes weights and scales activations on the fly;
+        "static" also fixes activation scales, calibrated on frames. The
+        quantized model is kept only if its nail masks match FP32 on the
+        same frames (mean IoU >= min_iou). Returns True if it was kept.
+        """
+        from torch.ao.quantization import (
+            default_dynamic_qconfig, get_default_qconfig,
+            quantize_dynamic_jit, quantize_jit,
+        )
+
+        if self.device != "cpu" or self.dtype != torch.float32:
+            print("⚠️  INT8 quantization needs FP32 CPU inference, skipped")
+            return False
+
+        print(f"🔢 Quantizing model to INT8 ({mode}, {len(frames)} frames)...")
+        inputs = [self.preprocess(frame).clone() for frame in frames]
+        reference = [self._nail_mask(*self.inference(x)[:2]) for x in inputs]
+
+        # Quantization passes need the unfrozen graph with its weights
+        model = torch.jit.load(self.model_path, map_location="cpu")
+        model.eval()
+        try:
+            if mode == "dynamic":
+                quantized = quantize_dynamic_jit(model, {"": default_dynamic_qconfig})
+            else:
+                engines = torch.backends.quantized.supported_engines
+                engine = "x86" if "x86" in engines else "fbgemm"
+                torch.backends.quantized.engine = engine
+                quantized = quantize_jit(
+                    model, {"": get_default_qconfig(engine)},
+                    self._calibrate, [inputs]
+                )
+        except RuntimeError as e:
+            print(f"⚠️  Quantization failed, keeping FP32: {e}")
+            return False
+
+        fp32_model, self.model = self.model, quantized
+        ious = []
+        for x, ref in zip(inputs, reference):
+            mask = self._nail_mask(*self.inference(x)[:2])
+            union = (mask | ref).sum().item()
+            ious.append((mask & ref).sum().item() / union if union else 1.0)
+        self.inference_times.clear()
+
+        mean_iou = sum(ious) / len(ious) if ious else 1.0
+        if mean_iou < min_iou:
+            self.model = fp32_model
+            print(f"⚠️  INT8 mask IoU {mean_iou:.3f} < {min_iou}, keeping FP32")
+            return False
+
+        print(f"✅ INT8 model active (mask IoU vs FP32: {mean_iou:.3f})")
+        return True
 
-        # Frame skipping
-        self.frame_skip = 1
-        self.frame_count = 0
-        self.last_result = None
+    @staticmethod
+    @torch.inference_mode()
+    def _calibrate(model, inputs):
+        """Run calibration inputs through an observed model"""
+        for x in inputs:
+            model(x)
+
+    def _nail_mask(self, mask_tensor, scores):
+        """Union of the confident detections' masks at model resolution"""
+        masks = mask_tensor[0]
+        if scores is not None:
+            masks = masks[(scores[0, :, 1] > self.confidence_threshold).to(masks.device)]
+        return (masks > 0.5).any(0)
 
     def preprocess(self, frame):
-        """Preprocess frame for model input"""
-        resized = cv2.resize(frame, (432, 432), interpolation=cv2.INTER_AREA)
-        rgb_normalized = cv2.cvtColor(resized, cv2.COLOR_BGR2RGB).astype(np.float32) / 255.0
-        img_array = np.transpose(rgb_normalized, (2, 0, 1))
-        img_tensor = torch.from_numpy(img_array).unsqueeze(0)
-        return img_tensor
+        """
+        Preprocess frame for model input.
+
+        Returns the preallocated input tensor, overwritten on every call.
+        """
+        if self.device == "cuda":
+            return self._preprocess_gpu(frame)
+
+        cv2.resize(frame, (432, 432), dst=self._resized, interpolation=cv2.INTER_AREA)
+
+        # BGR→RGB, uint8→float and /255 fused: each output channel is one
+        # torch kernel reading the opposite BGR channel, written straight
+        # into the input buffer (both sides are HWC in memory)
+        for c in range(3):
+            torch.mul(self._bgr_chw[2 - c], 1.0 / 255.0, out=self._input[0, c])
+        return self._input
+
+    @torch.inference_mode()
+    def _preprocess_gpu(self, frame):
+        """
+        CUDA path: upload the raw uint8 frame and resize, swap channels and
+        normalize on the device, so 1 byte/pixel crosses the bus instead of
+        the 4-byte float input.
+        """
+        frame_gpu = torch.from_numpy(frame).to(self.device, non_blocking=True)
+        x = frame_gpu.permute(2, 0, 1).unsqueeze(0).flip(1).to(self.dtype)  # BGR→RGB
+        x = F.interpolate(x, size=(432, 432), mode="area")
+        return x.mul_(1.0 / 255.0).contiguous(memory_format=torch.channels_last)
 
+    @torch.inference_mode()
     def inference(self, img_tensor):
         """Run inference"""
         start_time = time.time()
+        img_tensor = img_tensor.to(
+            self.device, dtype=self.dtype, memory_format=torch.channels_last, non_blocking=True
+        )
         outputs = self.model(img_tensor)
-        inference_time = (time.time() - start_time) * 1000
-        self.inference_times.append(inference_time)
+        return self._finish_outputs(outputs, start_time)
 
+    def _finish_outputs(self, outputs, start_time):
+        """Split model outputs and record the inference time"""
         if isinstance(outputs, tuple):
             boxes = outputs[0]
             scores = outputs[1]
@@ -130,6 +340,18 @@ class ProfessionalNailAR:
             mask_tensor = outputs
             scores = None
 
+        # Scores go to the host (tiny; also syncs the device for timing).
+        # Masks stay on the device in FP32 so the upsample runs there and
+        # only the final binary masks are copied back
+        mask_tensor = mask_tensor.float()
+        if scores is not None:
+            scores = scores.float().cpu()
+        elif self.device == "cuda":
+            torch.cuda.synchronize()
+
+        inference_time = (time.time() - start_time) * 1000
+        self.inference_times.append(inference_time)
+
         return mask_tensor, scores, inference_time
 
     def render_professional(self, mask_tensor, scores, original_frame):
@@ -139,61 +361,53 @@ class ProfessionalNailAR:
         start_time = time.time()
 
         # Get masks
-        masks = mask_tensor.squeeze(0).numpy()  # [200, 108, 108]
+        masks = mask_tensor.squeeze(0)  # [200, 108, 108]
         num_detections = masks.shape[0]
         frame_h, frame_w = original_frame.shape[:2]
 
-        # Get confidence scores
+        # Filter valid detections on the score tensor
         if scores is not None:
-            class_scores = scores.squeeze(0).numpy()
-            confidence_scores = class_scores[:, 1]
+            confidence_scores = scores[0, :, 1]
+            valid_indices = (confidence_scores > self.confidence_threshold).nonzero(as_tuple=True)[0]
         else:
-            confidence_scores = None
-
-        # Filter valid detections
-        if confidence_scores is not None:
-            valid_indices = np.where(confidence_scores > self.confidence_threshold)[0]
+            valid_indices = torch.arange(min(10, num_detections))
+
+        # Resize, threshold and area-filter all candidates in one batch
+        if len(valid_indices) > 0:
+            binary = F.interpolate(
+                masks[valid_indices.to(masks.device)].unsqueeze(1),
+                size=(frame_h, frame_w),
+                mode="bilinear",
+                align_corners=False
+            ).squeeze(1) > 0.5
+            binary = binary[binary.sum(dim=(-1, -2)) >= 100]
+            binary_masks = binary.cpu().numpy().view(np.uint8)
         else:
-            valid_indices = range(min(10, num_detections))
+            binary_masks = ()
 
         # Analyze geometry for each valid nail
         geometries = []
-        valid_confidences = []
-
-        for idx in valid_indices:
-            mask = masks[idx]
-            confidence = confidence_scores[idx] if confidence_scores is not None else 1.0
-
-            # Resize mask to frame size
-            mask_resized = cv2.resize(
-                mask,
-                (frame_w, frame_h),
-                interpolation=cv2.INTER_LINEAR
-            )
-
-            # Threshold
-            binary_mask = (mask_resized > 0.5).astype(np.uint8)
 
-            # Skip small masks
-            if np.sum(binary_mask) < 100:
-                continue
-
-            # Analyze geometry
+        for binary_mask in binary_masks:
             geometry = self.geometry_analyzer.analyze(binary_mask, min_area=100)
             if geometry is not None:
                 geometries.append(geometry)
-                valid_confidences.append(confidence)
 
-        # Render all nails with professional renderer
-        result = original_frame.copy()
+        # Render all nails with professional renderer, in place into the
+        # reusable output buffer
+        if self._overlay_buf is None or self._overlay_buf.shape != original_frame.shape:
+            self._overlay_buf = np.empty_like(original_frame)
+        result = self._overlay_buf
+        np.copyto(result, original_frame)
 
         for i, geometry in enumerate(geometries):
             # Use the current material for all nails
             # (You can customize this to use different materials per nail)
-            result = self.renderer.render_nail(
+            self.renderer.render_nail(
                 result,
                 geometry,
-                self.current_material
+                self.current_material,
+                out=result
             )
 
         render_time = (time.time() - start_time) * 1000
@@ -235,9 +449,74 @@ class ProfessionalNailAR:
         return sum(self.render_times) / len(self.render_times)
 
 
+class ProfessionalNailARTRT(ProfessionalNailAR):
+    """
+    ProfessionalNailAR running a prebuilt TensorRT engine (.plan) instead of
+    the TorchScript model. Same public API; build the engine with
+    build_engine.py.
+    """
+
+    def _load_model(self, model_path, bf16):
+        import tensorrt as trt
+
+        print(f"📦 Loading TensorRT engine from: {model_path}")
+        self.device = "cuda"
+
+        logger = trt.Logger(trt.Logger.WARNING)
+        with open(model_path, "rb") as f:
+            self.engine = trt.Runtime(logger).deserialize_cuda_engine(f.read())
+        self.context = self.engine.create_execution_context()
+        self.stream = torch.cuda.Stream()
+
+        torch_dtypes = {
+            trt.float32: torch.float32,
+            trt.float16: torch.float16,
+            trt.int32: torch.int32,
+            trt.int64: torch.int64,
+            trt.bool: torch.bool,
+        }
+
+        # One persistent device buffer per I/O tensor, bound once
+        self.buffers = {}
+        self.output_names = []
+        for i in range(self.engine.num_io_tensors):
+            name = self.engine.get_tensor_name(i)
+            buf = torch.empty(
+                tuple(self.engine.get_tensor_shape(name)),
+                dtype=torch_dtypes[self.engine.get_tensor_dtype(name)],
+                device=self.device
+            )
+            self.context.set_tensor_address(name, buf.data_ptr())
+            self.buffers[name] = buf
+            if self.engine.get_tensor_mode(name) == trt.TensorIOMode.INPUT:
+                self.input_name = name
+            else:
+                self.output_names.append(name)
+
+        self.dtype = self.buffers[self.input_name].dtype
+
+    @torch.inference_mode()
+    def inference(self, img_tensor):
+        """Run inference"""
+        start_time = time.time()
+        self.buffers[self.input_name].copy_(img_tensor, non_blocking=True)
+
+        self.stream.wait_stream(torch.cuda.current_stream())
+        self.context.execute_async_v3(self.stream.cuda_stream)
+        torch.cuda.current_stream().wait_stream(self.stream)
+
+        # Output buffers are reused by the next call while rendering still
+        # reads this frame's masks on the main thread, so hand out copies
+        outputs = tuple(self.buffers[name].clone() for name in self.output_names)
+        if len(outputs) == 1:
+            outputs = outputs[0]
+        return self._finish_outputs(outputs, start_time)
+
+
 def main():
     parser = argparse.ArgumentParser(description='Professional live nail AR')
-    parser.add_argument('--model', type=str, default=MODEL_PATH, help='Model path')
+    parser.add_argument('--model', type=str, default=MODEL_PATH,
+                        help='Model path (TorchScript .pt or TensorRT .plan)')
     parser.add_argument('--camera', type=int, default=0, help='Camera index')
     parser.add_argument('--threshold', type=float, default=0.2, help='Confidence threshold')
     parser.add_argument('--width', type=int, default=640, help='Camera width')
@@ -248,6 +527,12 @@ def main():
                         help='Process every N frames')
     parser.add_argument('--threads', type=int, default=4,
                         help='Number of CPU threads')
+    parser.add_argument('--bf16', action='store_true',
+                        help='BF16 CPU inference (AVX512-BF16/AMX CPUs)')
+    parser.add_argument('--quantize', choices=['none', 'dynamic', 'static'], default='none',
+                        help='INT8 CPU quantization (checked against FP32 masks)')
+    parser.add_argument('--calib-frames', type=int, default=100,
+                        help='Camera frames used to calibrate/check INT8 quantization')
 
     # Headless mode arguments
     parser.add_argument('--headless', action='store_true',
@@ -283,21 +568,27 @@ def main():
         print(f"   Saving every {args.save_every} frames")
         if args.max_frames:
             print(f"   Max frames: {args.max_frames}")
+
+        # Encode/write JPEGs off the main loop
+        frame_writer = AsyncFrameWriter()
     else:
         print("🖥️  GUI MODE - Interactive window")
         session_dir = None
+        frame_writer = None
 
     print()
     torch.set_num_threads(args.threads)
+    cv2.setNumThreads(args.threads)  # parallel_for_ row stripes in resize/blend
 
     # Initialize
     try:
-        nail_ar = ProfessionalNailAR(
+        nail_ar_cls = ProfessionalNailARTRT if args.model.endswith('.plan') else ProfessionalNailAR
+        nail_ar = nail_ar_cls(
             args.model,
             args.threshold,
-            args.material
+            args.material,
+            bf16=args.bf16
         )
-        nail_ar.frame_skip = args.skip_frames
     except Exception as e:
         print(f"❌ Failed to initialize: {e}")
         return 1
@@ -316,6 +607,32 @@ def main():
     cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
 
     print(f"✅ Camera opened")
+
+    if args.quantize != 'none':
+        calib_frames = []
+        while len(calib_frames) < args.calib_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            calib_frames.append(frame)
+        if calib_frames:
+            nail_ar.quantize(args.quantize, calib_frames)
+
+    frame_h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or args.height
+    frame_w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or args.width
+    nail_ar.warmup_pipeline((frame_h, frame_w, 3))
+
+    # Capture and inference run as background pipeline stages; rendering
+    # and display stay on the main thread
+    stop_event = threading.Event()
+    capture = ThreadedCapture(cap, stop_event, skip=args.skip_frames)
+
+    def infer(frame):
+        mask_tensor, scores, _ = nail_ar.inference(nail_ar.preprocess(frame))
+        return mask_tensor, scores
+
+    worker = InferenceWorker(infer, capture, stop_event, num_outputs=2)
+
     print("\n" + "="*60)
     print("PROFESSIONAL FEATURES:")
     print("  ✓ Curvature-aware shading (3D appearance)")
@@ -344,59 +661,61 @@ def main():
 
     paused = False
     frame_num = 0
+
+    # Static HUD text (material line, watermark), re-rasterized on change
+    hud_static = StaticTextLayer(350, 60, (255, 255, 255))
+    watermark = StaticTextLayer(350, 30, (200, 200, 255))
+    watermark.update([("PROFESSIONAL NAIL AR", (10, 20), 0.5, 1)])
+
+    # Dynamic HUD line templates, formatted into a reused list each frame
+    info_fmt = ("Inference: %.1fms", "Render: %.1fms", "Total: %.1fms", "FPS: %.1f", "Nails: %d")
+    info = [""] * len(info_fmt)
     total_frames = 0
 
     try:
         while True:
-            ret, frame = cap.read()
+            # Frame already preprocessed and inferred by the worker
+            ret, frame, mask_tensor, scores = worker.read()
             if not ret:
                 break
 
-            total_frames += 1
+            # Skipped frames are dropped in the capture thread (grab only)
+            total_frames += capture.skip
 
             if not paused:
-                # Frame skipping logic
-                should_process = (total_frames % nail_ar.frame_skip == 0)
-
-                if should_process:
-                    frame_num += 1
-
-                    # Preprocess
-                    img_tensor = nail_ar.preprocess(frame)
-
-                    # Inference
-                    mask_tensor, scores, inference_time = nail_ar.inference(img_tensor)
-
-                    # Professional rendering
-                    result, num_nails = nail_ar.render_professional(
-                        mask_tensor, scores, frame
-                    )
+                frame_num += 1
 
-                    nail_ar.last_result = result
-                else:
-                    # Reuse last result
-                    result = nail_ar.last_result if nail_ar.last_result is not None else frame
+                # Professional rendering
+                result, num_nails = nail_ar.render_professional(
+                    mask_tensor, scores, frame
+                )
 
                 # Add info overlay
                 avg_fps = nail_ar.get_avg_fps()
                 avg_render = nail_ar.get_avg_render_time()
 
-                info = [
-                    f"Material: {nail_ar.preset_names[nail_ar.current_preset_idx]}",
-                    f"Inference: {nail_ar.inference_times[-1] if nail_ar.inference_times else 0:.1f}ms",
-                    f"Render: {avg_render:.1f}ms",
-                    f"Total: {nail_ar.inference_times[-1] + avg_render if nail_ar.inference_times else 0:.1f}ms",
-                    f"FPS: {avg_fps:.1f}",
-                    f"Nails: {num_nails if should_process else '...'}",
-                ]
+                material_line = "Material: %s" % nail_ar.preset_names[nail_ar.current_preset_idx]
+                last_inference = nail_ar.inference_times[-1] if nail_ar.inference_times else 0
+                total = last_inference + avg_render if nail_ar.inference_times else 0
+                for i, value in enumerate((last_inference, avg_render, total, avg_fps, num_nails)):
+                    info[i] = info_fmt[i] % value
 
                 # Draw semi-transparent background for text
-                overlay_h = 30 + len(info) * 30
-                overlay_bg = result[0:overlay_h, 0:350].copy()
-                overlay_bg = cv2.addWeighted(overlay_bg, 0.3, np.zeros_like(overlay_bg), 0.7, 0)
-                result[0:overlay_h, 0:350] = overlay_bg
+                overlay_h = 60 + len(info) * 30
+                hud_bg = result[0:overlay_h, 0:350]
+                hud_bg[:] = cv2.convertScaleAbs(hud_bg, alpha=0.3)
+
+                # Static line and watermark from the cached layers, dynamic
+                # lines drawn live
+                hud_static.update([(material_line, (10, 30), 0.6, 2)])
+                hud_static.draw(result)
+                watermark.draw(result, 0, result.shape[0] - 30)
+
+                # GUI only: the headless writer needs a host array
+                if USE_UMAT and not headless_mode:
+                    result = cv2.UMat(result)
 
-                y = 30
+                y = 60
                 for text in info:
                     cv2.putText(
                         result, text, (10, y),
@@ -405,27 +724,21 @@ def main():
                     )
                     y += 30
 
-                # Watermark
-                cv2.putText(
-                    result, "PROFESSIONAL NAIL AR",
-                    (10, result.shape[0] - 10),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.5,
-                    (200, 200, 255), 1, cv2.LINE_AA
-                )
-
                 display_frame = result
 
             # Mode-specific display and interaction
             if headless_mode:
                 # Headless: Save frames to disk
-                if should_process and (frame_num % args.save_every == 0):
+                if frame_num % args.save_every == 0:
                     output_path = session_dir / f"frame_{frame_num:05d}.jpg"
-                    cv2.imwrite(str(output_path), display_frame)
-                    print(f"[{frame_num:5d}] Saved {output_path.name} | "
-                          f"{num_nails} nails | "
-                          f"Inference: {nail_ar.inference_times[-1]:.1f}ms | "
-                          f"Render: {avg_render:.1f}ms | "
-                          f"Total: {nail_ar.inference_times[-1] + avg_render:.1f}ms")
+                    frame_writer.save(
+                        display_frame, output_path,
+                        f"[{frame_num:5d}] Saved {output_path.name} | "
+                        f"{num_nails} nails | "
+                        f"Inference: {nail_ar.inference_times[-1]:.1f}ms | "
+                        f"Render: {avg_render:.1f}ms | "
+                        f"Total: {nail_ar.inference_times[-1] + avg_render:.1f}ms"
+                    )
 
                 # Check max frames limit
                 if args.max_frames and frame_num >= args.max_frames:
@@ -461,14 +774,16 @@ def main():
                     nail_ar.confidence_threshold = max(0.0, nail_ar.confidence_threshold - 0.05)
                     print(f"Threshold: {nail_ar.confidence_threshold:.2f}")
                 elif key == ord('f'):
-                    nail_ar.frame_skip = 1 if nail_ar.frame_skip > 1 else 2
-                    print(f"Frame skip: 1/{nail_ar.frame_skip}")
+                    capture.skip = 1 if capture.skip > 1 else 2
+                    print(f"Frame skip: 1/{capture.skip}")
 
     except KeyboardInterrupt:
         print("\n⚠️ Interrupted")
 
     finally:
-        cap.release()
+        capture.release()
+        if frame_writer is not None:
+            frame_writer.close()
 
         # Only call GUI functions if display is available
         if not headless_mode:
@@ -4,22 +4,45 @@ Tests the exported Android model on your computer with webcam
 """
 
 import torch
+import torch.nn.functional as F
 import cv2
 import numpy as np
-from PIL import Image
 import time
 import argparse
+import os
+import platform
+import threading
+from collections import deque
+
+from pipeline_utils import ThreadedCapture, InferenceWorker
 
 MODEL_PATH = "./pytorch_mobile_models/rfdetr_nails.pt"
 
+# Pre-exported INT8 lite-interpreter model (export_pytorch_mobile.py --quantize),
+# preferred over MODEL_PATH when present
+INT8_MODEL_PATH = "./pytorch_mobile_models/rfdetr_nails_int8.ptl"
+
+
 class NailSegmentationLive:
-    def __init__(self, model_path, confidence_threshold=0.5):
+    def __init__(self, model_path, confidence_threshold=0.5, quantize=False):
         """Initialize the nail segmentation model"""
-        print(f"📦 Loading PyTorch Mobile model from: {model_path}")
+        # int8 kernels: QNNPACK on ARM, FBGEMM on x86
+        arm = platform.machine().lower() in ("arm64", "aarch64")
+        torch.backends.quantized.engine = "qnnpack" if arm else "fbgemm"
 
         try:
-            self.model = torch.jit.load(model_path)
-            self.model.eval()
+            if model_path == MODEL_PATH and os.path.exists(INT8_MODEL_PATH):
+                model_path = INT8_MODEL_PATH
+
+            print(f"📦 Loading PyTorch Mobile model from: {model_path}")
+            if model_path.endswith(".ptl"):
+                from torch.jit.mobile import _load_for_lite_interpreter
+                self.model = _load_for_lite_interpreter(model_path)
+            else:
+                self.model = torch.jit.load(model_path)
+                self.model.eval()
+                if quantize:
+                    self.model = self._quantize_and_optimize(self.model)
             print("✅ Model loaded successfully")
         except Exception as e:
             print(f"❌ Failed to load model: {e}")
@@ -38,41 +61,76 @@ class NailSegmentationLive:
             (0, 255, 255),  # Yellow
         ]
 
-        # Performance tracking
-        self.inference_times = []
-
-    def preprocess(self, frame):
-        """Preprocess frame for model input"""
-        # Convert BGR to RGB
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-
-        # Convert to PIL Image
-        pil_image = Image.fromarray(rgb_frame)
+        # Label -> color lookup table: nail n (1-based) is drawn in
+        # colors[n % len(colors)], label 0 is background
+        self._color_lut = np.zeros((256, 1, 3), dtype=np.uint8)
+        for n in range(1, 256):
+            self._color_lut[n, 0] = self.colors[n % len(self.colors)]
 
-        # Resize to model input size
-        resized = pil_image.resize((self.input_size, self.input_size), Image.BILINEAR)
+        # 3×3 neighbourhood for outlines: the morphological gradient of the
+        # label map is a 2 px band on every nail boundary
+        self._outline_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
 
-        # Convert to tensor and normalize to [0, 1]
-        img_array = np.array(resized).astype(np.float32) / 255.0
+        # Preallocated model input, an NHWC buffer viewed as channels_last
+        # NCHW, and the resize target it is filled from; preprocess()
+        # overwrites both every frame
+        size = self.input_size
+        self._resized = np.empty((size, size, 3), dtype=np.uint8)
+        self._bgr_chw = torch.from_numpy(self._resized).permute(2, 0, 1)
+        self._input = torch.empty((1, size, size, 3)).permute(0, 3, 1, 2)
 
-        # Transpose to CHW format
-        img_array = np.transpose(img_array, (2, 0, 1))
+        # Frame-size postprocess buffers, reused across frames and
+        # (re)allocated whenever the frame shape changes
+        self._overlay_buf = None
 
-        # Add batch dimension
-        img_tensor = torch.from_numpy(img_array).unsqueeze(0)
+        # Performance tracking
+        self.inference_times = deque(maxlen=30)
+
+    @staticmethod
+    def _quantize_and_optimize(model):
+        """
+        Load-time fallback when no INT8 export exists: dynamic INT8
+        quantization of the TorchScript graph, then optimize_for_mobile
+        (conv-bn folding, prepacked XNNPACK/int8 weights).
+        """
+        from torch.ao.quantization import default_dynamic_qconfig, quantize_dynamic_jit
+        from torch.utils.mobile_optimizer import optimize_for_mobile
+
+        print(f"🔢 Quantizing to INT8 ({torch.backends.quantized.engine})...")
+        model = quantize_dynamic_jit(model, {"": default_dynamic_qconfig})
+        return optimize_for_mobile(model)
 
-        return img_tensor, rgb_frame
+    def preprocess(self, frame):
+        """
+        Preprocess frame for model input.
+
+        Returns the preallocated input tensor, overwritten on every call.
+        """
+        # Resize first, so everything after touches 432×432 pixels only
+        cv2.resize(
+            frame,
+            (self.input_size, self.input_size),
+            dst=self._resized,
+            interpolation=cv2.INTER_AREA
+        )
+
+        # BGR→RGB, uint8→float and /255 fused: each output channel is one
+        # torch kernel reading the opposite BGR channel, written straight
+        # into the input buffer
+        for c in range(3):
+            torch.mul(self._bgr_chw[2 - c], 1.0 / 255.0, out=self._input[0, c])
+
+        return self._input
 
     def inference(self, img_tensor):
         """Run inference on preprocessed image"""
         with torch.no_grad():
             start_time = time.time()
-            outputs = self.model(img_tensor)
+            # NHWC so the XNNPACK/int8 conv kernels take their fast path
+            outputs = self.model(img_tensor.contiguous(memory_format=torch.channels_last))
             inference_time = (time.time() - start_time) * 1000  # Convert to ms
 
             self.inference_times.append(inference_time)
-            if len(self.inference_times) > 30:
-                self.inference_times.pop(0)
 
         # Extract outputs
         # Model returns tuple of 3 tensors:
@@ -89,84 +147,92 @@ class NailSegmentationLive:
 
         return mask_tensor, scores, inference_time
 
+    def _ensure_buffers(self, frame_shape):
+        """Allocate the postprocess buffers for frame_shape if needed"""
+        if self._overlay_buf is not None and self._overlay_buf.shape == frame_shape:
+            return
+        frame_h, frame_w = frame_shape[:2]
+        self._overlay_buf = np.empty(frame_shape, dtype=np.uint8)
+        self._colored_buf = np.empty(frame_shape, dtype=np.uint8)
+        self._label3_buf = np.empty((frame_h, frame_w, 3), dtype=np.uint8)
+        self._label_buf = np.empty((frame_h, frame_w), dtype=np.uint8)
+        self._dilated_buf = np.empty((frame_h, frame_w), dtype=np.uint8)
+        self._edges_buf = np.empty((frame_h, frame_w), dtype=np.uint8)
+
     def postprocess(self, mask_tensor, scores, original_frame):
-        """Post-process masks and overlay on frame"""
+        """
+        Post-process masks and overlay on frame.
+
+        Returns the preallocated overlay buffer, overwritten on every call.
+        """
         # Get mask data
-        masks = mask_tensor.squeeze(0).numpy()  # [200, 108, 108]
-        num_detections, mask_h, mask_w = masks.shape
+        masks = mask_tensor[0]  # [200, 108, 108]
 
         frame_h, frame_w = original_frame.shape[:2]
+        self._ensure_buffers(original_frame.shape)
+        overlay = self._overlay_buf
 
-        # Get class scores if available
+        # Foreground class score (index 1) if available, otherwise fall back
+        # to mask intensity; filtered on the tensor in one pass
         if scores is not None:
-            class_scores = scores.squeeze(0).numpy()  # [200, 2]
-            # Get foreground class score (index 1)
-            confidence_scores = class_scores[:, 1]
+            confidence_scores = scores[0, :, 1]
         else:
-            confidence_scores = None
-
-        # Create overlay
-        overlay = original_frame.copy()
-
-        detected_nails = 0
-
-        for i in range(num_detections):
-            mask = masks[i]
-
-            # Check confidence score first if available
-            if confidence_scores is not None:
-                confidence = confidence_scores[i]
-                if confidence < self.confidence_threshold:
-                    continue
-            else:
-                # Fall back to checking mask intensity
-                max_value = mask.max()
-                confidence = max_value
-                if max_value < self.confidence_threshold:
-                    continue
-
-            # Check if mask is significant
-            if True:  # Already filtered above
-                detected_nails += 1
-
-                # Resize mask to frame size
-                mask_resized = cv2.resize(
-                    mask,
-                    (frame_w, frame_h),
-                    interpolation=cv2.INTER_LINEAR
-                )
-
-                # Threshold mask
-                binary_mask = (mask_resized > 0.5).astype(np.uint8)
-
-                # Create colored mask
-                color = self.colors[detected_nails % len(self.colors)]
-                colored_mask = np.zeros_like(original_frame)
-                colored_mask[binary_mask == 1] = color
-
-                # Blend with overlay
-                overlay = cv2.addWeighted(overlay, 1, colored_mask, 0.4, 0)
-
-                # Draw contours
-                contours, _ = cv2.findContours(
-                    binary_mask,
-                    cv2.RETR_EXTERNAL,
-                    cv2.CHAIN_APPROX_SIMPLE
+            confidence_scores = masks.amax(dim=(1, 2))
+        valid_indices = (confidence_scores >= self.confidence_threshold).nonzero(as_tuple=True)[0]
+        valid_indices = valid_indices[:255]  # labels are uint8
+        valid_confidences = confidence_scores[valid_indices].tolist()
+        detected_nails = len(valid_confidences)
+
+        if detected_nails == 0:
+            np.copyto(overlay, original_frame)
+            return overlay, 0
+
+        # Upsample all kept masks to model input space in one batched call
+        # and fold them into a label map (nail n -> n; later nails win where
+        # they overlap), so only one frame-size resize remains
+        size = self.input_size
+        binary = F.interpolate(
+            masks[valid_indices].unsqueeze(1),
+            size=(size, size),
+            mode="bilinear",
+            align_corners=False
+        ).squeeze(1) > 0.5
+        labels = torch.arange(1, detected_nails + 1, dtype=torch.uint8)
+        label_map = (binary * labels[:, None, None]).amax(dim=0).numpy()
+        label_map = cv2.resize(
+            label_map, (frame_w, frame_h), dst=self._label_buf, interpolation=cv2.INTER_NEAREST
+        )
+
+        # Color every nail through the LUT and blend once
+        label3 = cv2.merge([label_map] * 3, self._label3_buf)
+        colored = cv2.LUT(label3, self._color_lut, self._colored_buf)
+        cv2.addWeighted(original_frame, 1, colored, 0.4, 0, dst=overlay)
+
+        # Outline every nail in one pass: boundary pixels of the label map,
+        # colored by the neighbouring nail label (touching nails stay apart);
+        # the label/color buffers are free again and are reused for it
+        edges = cv2.morphologyEx(
+            label_map, cv2.MORPH_GRADIENT, self._outline_kernel, dst=self._edges_buf
+        )
+        dilated = cv2.dilate(label_map, self._outline_kernel, dst=self._dilated_buf)
+        outline = cv2.LUT(cv2.merge([dilated] * 3, label3), self._color_lut, colored)
+        cv2.copyTo(outline, edges, overlay)
+
+        # Confidence text at each nail's centroid, from mask moments on the
+        # model-space masks, scaled to the frame
+        coords = torch.arange(size, dtype=torch.float32)
+        areas = binary.sum(dim=(1, 2)).float()
+        cx = (binary.sum(dim=1).float() @ coords) / areas.clamp(min=1) * (frame_w / size)
+        cy = (binary.sum(dim=2).float() @ coords) / areas.clamp(min=1) * (frame_h / size)
+
+        for confidence, area, x, y in zip(valid_confidences, areas.tolist(), cx.tolist(), cy.tolist()):
+            if area > 0:
+                cv2.putText(
+                    overlay, f"{confidence:.2f}",
+                    (int(x) - 20, int(y)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5,
+                    (255, 255, 255), 2, cv2.LINE_AA
                 )
-                cv2.drawContours(overlay, contours, -1, color, 2)
-
-                # Draw confidence text on mask
-                if len(contours) > 0:
-                    M = cv2.moments(contours[0])
-                    if M["m00"] != 0:
-                        cx = int(M["m10"] / M["m00"])
-                        cy = int(M["m01"] / M["m00"])
-                        cv2.putText(
-                            overlay, f"{confidence:.2f}",
-                            (cx - 20, cy),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.5,
-                            (255, 255, 255), 2, cv2.LINE_AA
-                        )
 
         return overlay, detected_nails
 
@@ -184,6 +250,8 @@ def main():
     parser.add_argument('--threshold', type=float, default=0.2, help='Confidence threshold (0-1)')
     parser.add_argument('--width', type=int, default=1080, help='Camera frame width')
     parser.add_argument('--height', type=int, default=1280, help='Camera frame height')
+    parser.add_argument('--quantize', action='store_true',
+                        help='INT8-quantize a .pt model at load time (when no int8 .ptl export exists)')
     args = parser.parse_args()
 
     print("\n" + "="*60)
@@ -192,7 +260,7 @@ def main():
 
     # Initialize model
     try:
-        segmentation = NailSegmentationLive(args.model, args.threshold)
+        segmentation = NailSegmentationLive(args.model, args.threshold, quantize=args.quantize)
     except Exception as e:
         print(f"❌ Failed to initialize: {e}")
         return 1
@@ -213,6 +281,17 @@ def main():
     actual_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
 
     print(f"✅ Camera opened: {actual_width}×{actual_height}")
+
+    # Capture and inference run as background pipeline stages; leave a
+    # core each for the capture thread and postprocess/display here
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) - 2))
+    stop_event = threading.Event()
+    capture = ThreadedCapture(cap, stop_event)
+
+    def infer(frame):
+        return segmentation.inference(segmentation.preprocess(frame))
+
+    worker = InferenceWorker(infer, capture, stop_event, num_outputs=3)
     print("\n" + "="*60)
     print("CONTROLS:")
     print("  'q' or 'ESC' - Quit")
@@ -226,20 +305,15 @@ def main():
 
     try:
         while True:
-            if not paused:
-                ret, frame = cap.read()
-                if not ret:
-                    print("❌ Failed to read frame")
-                    break
+            # Keep draining the pipeline while paused so it stays live
+            ret, frame, mask_tensor, scores, inference_time = worker.read()
+            if not ret:
+                print("❌ Failed to read frame")
+                break
 
+            if not paused:
                 frame_count += 1
 
-                # Preprocess
-                img_tensor, rgb_frame = segmentation.preprocess(frame)
-
-                # Run inference
-                mask_tensor, scores, inference_time = segmentation.inference(img_tensor)
-
                 # Post-process and visualize
                 overlay, num_nails = segmentation.postprocess(mask_tensor, scores, frame)
 
@@ -304,7 +378,7 @@ def main():
 
     finally:
         # Cleanup
-        cap.release()
+        capture.release()
         cv2.destroyAllWindows()
 
         # Print statistics
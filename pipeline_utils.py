@@ -0,0 +1,154 @@
+"""
+Live Pipeline Helpers
+Shared capture / inference stages and HUD helpers for the live inference scripts
+"""
+
+import queue
+import threading
+
+import cv2
+import numpy as np
+
+
+def put_latest(q, item):
+    """Enqueue item without blocking, discarding the stalest entry if full"""
+    while True:
+        try:
+            q.put_nowait(item)
+            return
+        except queue.Full:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                pass
+
+
+class ThreadedCapture:
+    """
+    Pipeline stage 1: reads camera frames on a background thread.
+
+    Holds at most `maxsize` frames; when the consumer falls behind the
+    stalest frame is dropped rather than queued, so capture never blocks
+    and downstream stages always see a recent frame. With `skip` > 1 only
+    every skip-th frame is decoded; the others are grabbed and discarded.
+    """
+
+    def __init__(self, cap, stop_event=None, skip=1, maxsize=1):
+        self.cap = cap
+        self.skip = max(1, skip)
+        self.stop_event = stop_event if stop_event is not None else threading.Event()
+        self.frames = queue.Queue(maxsize=maxsize)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            # Advance past skipped frames without decoding them
+            for _ in range(self.skip - 1):
+                self.cap.grab()
+            ret, frame = self.cap.read()
+            if not ret:
+                # End of stream sentinel
+                put_latest(self.frames, None)
+                return
+            put_latest(self.frames, frame)
+
+    def read(self):
+        """Same contract as cv2.VideoCapture.read()"""
+        frame = self.frames.get()
+        return frame is not None, frame
+
+    def release(self):
+        self.stop_event.set()
+        self.thread.join(timeout=1.0)
+        self.cap.release()
+
+
+class InferenceWorker:
+    """
+    Pipeline stage 2: runs `process(frame)` on a background thread.
+
+    `process` does the per-frame model work (preprocess + forward) and
+    returns a tuple of `num_outputs` results. It overlaps rendering/display
+    of the current frame on the main thread (which must own the GUI calls),
+    so steady-state frame time is the slower of the two stages rather than
+    their sum. Results are dropped oldest-first when the main thread falls
+    behind.
+    """
+
+    def __init__(self, process, capture, stop_event, num_outputs, maxsize=2):
+        self.process = process
+        self.capture = capture
+        self.stop_event = stop_event
+        self.num_outputs = num_outputs
+        self.results = queue.Queue(maxsize=maxsize)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        # Always end with a final item, so read() never blocks on a dead
+        # thread: None at end of stream/stop, or the exception that killed it
+        last = None
+        try:
+            while not self.stop_event.is_set():
+                ret, frame = self.capture.read()
+                if not ret:
+                    return
+
+                put_latest(self.results, (frame,) + tuple(self.process(frame)))
+        except Exception as exc:
+            last = exc
+        finally:
+            put_latest(self.results, last)
+
+    def read(self):
+        """
+        Returns (ok, frame, *outputs); all None past the end of the stream.
+
+        Re-raises the exception that stopped the worker thread.
+        """
+        item = self.results.get()
+        if isinstance(item, Exception):
+            raise item
+        if item is None:
+            return (False, None) + (None,) * self.num_outputs
+        return (True,) + item
+
+
+class StaticTextLayer:
+    """
+    HUD text that rarely changes, rasterized once into an alpha layer.
+
+    Each frame costs one blend over the layer's rectangle instead of a
+    cv2.putText per line; text is re-rasterized only when it changes.
+    """
+
+    def __init__(self, width, height, color):
+        self.width = width
+        self.height = height
+        self._color_tile = np.empty((height, width, 3), dtype=np.uint8)
+        self._color_tile[:] = color
+        self._lines = None
+        self._alpha = None
+        self._inv_alpha = None
+
+    def update(self, lines):
+        """lines: list of (text, (x, y), font_scale, thickness) in layer coordinates"""
+        if lines == self._lines:
+            return
+        mask = np.zeros((self.height, self.width), dtype=np.uint8)
+        for text, org, scale, thickness in lines:
+            cv2.putText(mask, text, org, cv2.FONT_HERSHEY_SIMPLEX, scale,
+                        255, thickness, cv2.LINE_AA)
+        self._alpha = mask.astype(np.float32) / 255.0
+        self._inv_alpha = 1.0 - self._alpha
+        self._lines = lines
+
+    def draw(self, image, x=0, y=0):
+        """Alpha-blend the cached text onto image with its top-left at (x, y)"""
+        roi = image[y:y + self.height, x:x + self.width]
+        h, w = roi.shape[:2]
+        roi[:] = cv2.blendLinear(
+            self._color_tile[:h, :w], roi,
+            self._alpha[:h, :w], self._inv_alpha[:h, :w]
+        )
@@ -14,7 +14,7 @@ class NailGeometry:
     """Geometric properties of a nail extracted from mask"""
     contour: np.ndarray  # Main contour points
     center: Tuple[int, int]  # Center point (cx, cy)
-    orientation_angle: float  # Nail orientation in degrees
+    orientation_angle: float  # Nail orientation in degrees, in [0, 180)
     length: float  # Length along major axis
     width: float  # Width along minor axis
     curvature_map: np.ndarray  # Distance transform for shading
@@ -39,71 +39,105 @@ class NailGeometryAnalyzer:
 
         Args:
             mask: Binary mask (H, W) with values 0 or 1
-            min_area: Minimum contour area to consider
+            min_area: Minimum nail area (pixels) to consider
 
         Returns:
             NailGeometry object or None if no valid nail found
         """
-        # Ensure uint8 format
-        binary_mask = (mask > 0.5).astype(np.uint8)
-
-        # Find contours
-        contours, _ = cv2.findContours(
-            binary_mask,
-            cv2.RETR_EXTERNAL,
-            cv2.CHAIN_APPROX_SIMPLE
+        # Binary 0/1 uint8 mask (a view, without copying, for bool masks)
+        if mask.dtype == np.bool_:
+            binary_mask = mask.view(np.uint8)
+        else:
+            binary_mask = (mask > 0.5).view(np.uint8)
+        h, w = binary_mask.shape
+
+        # Work on the nail's bounding box only, padded so that the distance
+        # transform and 5×5 Sobel see the same zero border as on the full
+        # frame; results are pasted back into frame-size maps
+        bx, by, bw, bh = cv2.boundingRect(binary_mask)
+        if bw == 0 or bh == 0:
+            return None
+        pad = 3
+        x0, y0 = max(bx - pad, 0), max(by - pad, 0)
+        x1, y1 = min(bx + bw + pad, w), min(by + bh + pad, h)
+        sub_mask = binary_mask[y0:y1, x0:x1]
+
+        # One labelling pass gives every blob's area, bbox and centroid;
+        # the nail is the largest blob
+        num, labels, stats, centroids = cv2.connectedComponentsWithStats(
+            sub_mask, 8, cv2.CV_32S
         )
-
-        if not contours:
+        if num < 2:
             return None
 
-        # Get largest contour
-        main_contour = max(contours, key=cv2.contourArea)
-        area = cv2.contourArea(main_contour)
+        main = 1 + int(stats[1:, cv2.CC_STAT_AREA].argmax())
+        area = stats[main, cv2.CC_STAT_AREA]
 
         if area < min_area:
             return None
 
-        # Calculate center of mass
-        M = cv2.moments(main_contour)
-        if M["m00"] == 0:
-            return None
+        # Center of mass
+        cx = int(centroids[main, 0]) + x0
+        cy = int(centroids[main, 1]) + y0
 
-        cx = int(M["m10"] / M["m00"])
-        cy = int(M["m01"] / M["m00"])
+        # Get bounding box
+        bbox = (
+            int(stats[main, cv2.CC_STAT_LEFT]) + x0,
+            int(stats[main, cv2.CC_STAT_TOP]) + y0,
+            int(stats[main, cv2.CC_STAT_WIDTH]),
+            int(stats[main, cv2.CC_STAT_HEIGHT]),
+        )
+
+        # Outline of the nail blob (in frame coordinates)
+        main_mask = cv2.compare(labels, main, cv2.CMP_EQ)
+        contours, _ = cv2.findContours(
+            main_mask,
+            cv2.RETR_EXTERNAL,
+            cv2.CHAIN_APPROX_SIMPLE,
+            offset=(x0, y0)
+        )
+        main_contour = contours[0]
 
-        # Fit ellipse to get orientation and dimensions
         if len(main_contour) >= 5:
-            ellipse = cv2.fitEllipse(main_contour)
-            (ex, ey), (minor_axis, major_axis), angle = ellipse
-            orientation_angle = angle
-            length = major_axis
-            width = minor_axis
+            # Orientation and dimensions from the blob's second central
+            # moments (the equivalent ellipse; replaces fitEllipse). Angles
+            # follow the fitEllipse convention, i.e. the major axis at
+            # angle - 90 degrees.
+            M = cv2.moments(main_mask, binaryImage=True)
+            mu20 = M["mu20"] / M["m00"]
+            mu02 = M["mu02"] / M["m00"]
+            mu11 = M["mu11"] / M["m00"]
+            spread = np.sqrt(((mu20 - mu02) / 2) ** 2 + mu11 ** 2)
+            major_var = (mu20 + mu02) / 2 + spread
+            minor_var = max((mu20 + mu02) / 2 - spread, 0.0)
+
+            orientation_angle = (np.degrees(0.5 * np.arctan2(2 * mu11, mu20 - mu02)) + 90) % 180
+            length = 4 * np.sqrt(major_var)
+            width = 4 * np.sqrt(minor_var)
         else:
-            # Fallback for small contours
-            x, y, w, h = cv2.boundingRect(main_contour)
+            # Fallback for small contours (e.g. axis-aligned rectangles)
             orientation_angle = 0
-            length = max(w, h)
-            width = min(w, h)
-
-        # Get bounding box
-        bbox = cv2.boundingRect(main_contour)
+            length = max(bbox[2], bbox[3])
+            width = min(bbox[2], bbox[3])
 
         # Compute distance transform for curvature-aware shading
         # This creates a map where center is brightest, edges are darkest
-        curvature_map = cv2.distanceTransform(
-            binary_mask,
+        sub_curvature = cv2.distanceTransform(
+            sub_mask,
             cv2.DIST_L2,
             5
         )
 
-        # Normalize curvature map
-        if curvature_map.max() > 0:
-            curvature_map = curvature_map / curvature_map.max()
+        # Normalize curvature map (min is 0 at the zero border)
+        cv2.normalize(sub_curvature, sub_curvature, 0, 1, cv2.NORM_MINMAX)
+
+        curvature_map = np.zeros((h, w), dtype=np.float32)
+        curvature_map[y0:y1, x0:x1] = sub_curvature
 
         # Compute edge distance map (inverted distance transform)
         # Useful for edge feathering
-        edge_distance_map = curvature_map.copy()
+        edge_distance_map = np.zeros((h, w), dtype=np.float32)
+        edge_distance_map[y0:y1, x0:x1] = sub_curvature
 
         # Calculate highlight point (slightly offset from center along major axis)
         # This simulates where light would reflect most strongly
@@ -112,7 +146,8 @@ class NailGeometryAnalyzer:
         )
 
         # Generate simple normal map (gradient-based)
-        normal_map = self._generate_normal_map(curvature_map, binary_mask)
+        normal_map = np.zeros((h, w, 3), dtype=np.float32)
+        normal_map[y0:y1, x0:x1] = self._generate_normal_map(sub_curvature, sub_mask)
 
         return NailGeometry(
             contour=main_contour,
@@ -164,27 +199,21 @@ class NailGeometryAnalyzer:
         grad_x = cv2.Sobel(curvature_map, cv2.CV_32F, 1, 0, ksize=5)
         grad_y = cv2.Sobel(curvature_map, cv2.CV_32F, 0, 1, ksize=5)
 
-        # Create normal vectors
-        # For a curved surface, normals point outward
-        # Z component is positive (pointing toward viewer)
-        h, w = curvature_map.shape
-        normal_map = np.zeros((h, w, 3), dtype=np.float32)
-
-        # X and Y from gradients (inverted for proper lighting)
-        normal_map[:, :, 0] = -grad_x
-        normal_map[:, :, 1] = -grad_y
-
-        # Z component (pointing out of screen)
-        # Higher curvature = more perpendicular to viewer
-        normal_map[:, :, 2] = 1.0 + curvature_map * 2.0
-
-        # Normalize vectors
-        norm = np.linalg.norm(normal_map, axis=2, keepdims=True)
-        norm = np.maximum(norm, 1e-8)  # Avoid division by zero
-        normal_map = normal_map / norm
-
-        # Mask out non-nail regions
-        normal_map[mask == 0] = [0, 0, 0]
+        # Normal vectors: X and Y from gradients (inverted for proper
+        # lighting); Z points out of the screen, and higher curvature =
+        # more perpendicular to viewer. Since Z >= 1 the norm never
+        # vanishes, so no epsilon guard is needed.
+        normal_z = curvature_map * 2.0 + 1.0
+        norm = cv2.magnitude(cv2.magnitude(grad_x, grad_y), normal_z)
+
+        # Normalize and mask out non-nail regions in the same pass:
+        # the scale is 1/|n| on the nail and 0 elsewhere
+        inv_norm = cv2.divide(mask.astype(np.float32), norm)
+        normal_map = cv2.merge([
+            cv2.multiply(grad_x, inv_norm, scale=-1),
+            cv2.multiply(grad_y, inv_norm, scale=-1),
+            cv2.multiply(normal_z, inv_norm),
+        ])
 
         return normal_map
 
@@ -261,12 +290,21 @@ def analyze_all_nails(masks: np.ndarray, min_area: float = 100.0) -> Dict[int, N
     Returns:
         Dictionary mapping nail index to NailGeometry
     """
+    if len(masks) == 0:
+        return {}
+
     analyzer = NailGeometryAnalyzer()
+
+    # Skip masks whose total area is already below the threshold; the
+    # largest blob can never be bigger than the whole mask
+    areas = (masks > 0.5).reshape(masks.shape[0], -1).sum(1)
+    keep = np.nonzero(areas >= min_area)[0]
+
     geometries = {}
 
-    for i, mask in enumerate(masks):
-        geom = analyzer.analyze(mask, min_area)
+    for i in keep:
+        geom = analyzer.analyze(masks[i], min_area)
         if geom is not None:
-            geometries[i] = geom
+            geometries[int(i)] = geom
 
     return geometries
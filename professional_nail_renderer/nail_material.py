@@ -3,6 +3,9 @@ Nail Material System
 Defines material properties for photo-realistic nail polish rendering
 """
 
+import copy
+import functools
+
 import numpy as np
 from dataclasses import dataclass
 from typing import Tuple, Optional
@@ -332,8 +335,9 @@ class MaterialPresets:
         return NailMaterial(base_color=normalized_color, **props)
 
     @staticmethod
-    def all_presets() -> dict:
-        """Get all preset materials as a dictionary"""
+    @functools.lru_cache(maxsize=1)
+    def _preset_table() -> dict:
+        """Preset materials built once per process (never handed out directly)"""
         return {
             "glossy_red": MaterialPresets.glossy_red(),
             "glossy_nude": MaterialPresets.glossy_nude(),
@@ -347,3 +351,16 @@ class MaterialPresets:
             "holographic": MaterialPresets.holographic(),
             "satin_burgundy": MaterialPresets.satin_burgundy(),
         }
+
+    @staticmethod
+    def all_presets() -> dict:
+        """
+        Get all preset materials as a dictionary.
+
+        Each call returns a new dict of copies, so callers may edit the
+        materials without affecting anyone else.
+        """
+        return {
+            name: copy.copy(material)
+            for name, material in MaterialPresets._preset_table().items()
+        }
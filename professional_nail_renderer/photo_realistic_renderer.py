@@ -10,13 +10,31 @@ Implements professional-quality nail polish rendering with:
 
 import cv2
 import numpy as np
-from typing import Tuple, Optional
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Tuple, Optional
 import random
 
 from .nail_geometry import NailGeometry
 from .nail_material import NailMaterial
 
 
+# Entries per shading lookup table (inputs are in [0, 1])
+LUT_SIZE = 65536
+
+# Materials whose shading LUTs are kept (least recently used are dropped)
+SHADING_CACHE_SIZE = 16
+
+
+@dataclass
+class MaterialShading:
+    """Per-material shading terms that do not depend on nail geometry"""
+    linear_base: np.ndarray     # (3,) base color, BGR, linear space
+    shading_lut: np.ndarray     # curvature -> diffuse shading
+    specular_lut: np.ndarray    # N·H -> specular intensity
+    specular_color: np.ndarray  # (3,) highlight tint, BGR
+
+
 class PhotoRealisticNailRenderer:
     """
     Professional nail renderer using physically-based shading.
@@ -46,12 +64,75 @@ class PhotoRealisticNailRenderer:
         # View direction (camera is looking straight at the nail)
         self.view_direction = np.array([0, 0, 1], dtype=np.float32)
 
+        # Shading LUTs per material, built on first use and keyed on the
+        # material values they depend on (bounded LRU)
+        self._shading_cache: "OrderedDict[tuple, MaterialShading]" = OrderedDict()
+
+    def clear_material_cache(self):
+        """Drop all cached per-material shading (e.g. to free memory)"""
+        self._shading_cache.clear()
+
+    def _material_shading(self, material: NailMaterial) -> MaterialShading:
+        """Look up (or build) the precomputed shading terms for a material"""
+        key = (
+            tuple(float(c) for c in material.base_color),
+            tuple(float(c) for c in material.specular_tint),
+            float(material.glossiness),
+            float(material.roughness),
+            float(material.metallic),
+            float(material.specular_intensity),
+        )
+        cached = self._shading_cache.get(key)
+        if cached is not None:
+            self._shading_cache.move_to_end(key)
+            return cached
+
+        x = np.linspace(0, 1, LUT_SIZE, dtype=np.float32)
+
+        # Curvature shading curve
+        shading_strength = 0.3 + material.glossiness * 0.5
+        gamma = 1.5 - material.roughness * 0.5
+        shading_lut = (1.0 - shading_strength) + np.power(x, gamma) * shading_strength
+
+        # Blinn-Phong specular falloff
+        shininess = 10 + material.glossiness * 200
+        specular_lut = np.power(x, shininess) * material.specular_intensity
+
+        # Highlight color, tinted with the base color for metallic materials
+        r, g, b = material.specular_tint
+        specular_color = np.array([b, g, r], dtype=np.float32)
+        if material.metallic > 0.5:
+            base_r, base_g, base_b = material.base_color
+            base_bgr = np.array([base_b, base_g, base_r], dtype=np.float32)
+            specular_color *= (1 - material.metallic) + base_bgr * material.metallic
+
+        r, g, b = material.base_color
+        linear_base = self._srgb_to_linear(np.array([b, g, r], dtype=np.float32))
+
+        shading = MaterialShading(
+            linear_base=linear_base.astype(np.float32),
+            shading_lut=shading_lut.astype(np.float32),
+            specular_lut=specular_lut.astype(np.float32),
+            specular_color=specular_color,
+        )
+        self._shading_cache[key] = shading
+        if len(self._shading_cache) > SHADING_CACHE_SIZE:
+            self._shading_cache.popitem(last=False)
+        return shading
+
+    @staticmethod
+    def _lut_index(values: np.ndarray) -> np.ndarray:
+        """Map values in [0, 1] to the nearest LUT entry"""
+        index = np.clip(values, 0, 1) * (LUT_SIZE - 1) + 0.5
+        return index.astype(np.intp)
+
     def render_nail(
         self,
         image: np.ndarray,
         geometry: NailGeometry,
         material: NailMaterial,
-        blend_mode: str = "normal"
+        blend_mode: str = "normal",
+        out: Optional[np.ndarray] = None
     ) -> np.ndarray:
         """
         Render a single nail with photo-realistic materials.
@@ -61,20 +142,97 @@ class PhotoRealisticNailRenderer:
             geometry: NailGeometry object with curvature info
             material: NailMaterial defining appearance
             blend_mode: How to blend with background ("normal", "multiply", "screen")
+            out: Optional uint8 array to write the result into (may be image)
 
         Returns:
             Rendered image with nail polish applied
         """
         h, w = image.shape[:2]
-        result = image.copy()
+        final_color, alpha_3ch = self._shade_nail(geometry, material, (h, w))
+
+        # FINAL COMPOSITE
+        # Blend nail color with original image
+        result = image.astype(np.float32) / 255.0
+        result = result * (1 - alpha_3ch) + final_color * alpha_3ch
+
+        # Convert back to uint8
+        if out is not None:
+            np.clip(result, 0, 1, out=result)
+            result *= 255
+            np.copyto(out, result, casting='unsafe')
+            return out
+
+        result = (np.clip(result, 0, 1) * 255).astype(np.uint8)
+
+        return result
+
+    def render_nails_batch(
+        self,
+        image: np.ndarray,
+        geometries: list,
+        material: NailMaterial,
+    ) -> np.ndarray:
+        """
+        Render several nails with the same material.
+
+        Produces the same image as calling render_nail once per nail, but
+        the frame itself is read and written only once: per-nail layers
+        are accumulated in float and composited in a single final pass.
+
+        Args:
+            image: Background image (H, W, 3) BGR format
+            geometries: List of NailGeometry objects
+            material: NailMaterial applied to every nail
+
+        Returns:
+            Image with all nails rendered
+        """
+        return self._composite_nails(image, [(g, material) for g in geometries])
+
+    def _composite_nails(self, image: np.ndarray, nails: list) -> np.ndarray:
+        """Composite (geometry, material) pairs over image in one pass"""
+        if not nails:
+            return image.copy()
+
+        h, w = image.shape[:2]
+
+        # Accumulate "over" compositing: result = image * transmittance + layer
+        layer = np.zeros((h, w, 3), dtype=np.float32)
+        transmittance = np.ones((h, w, 3), dtype=np.float32)
+
+        for geometry, material in nails:
+            final_color, alpha_3ch = self._shade_nail(geometry, material, (h, w))
+            inv_alpha = 1 - alpha_3ch
+            layer *= inv_alpha
+            layer += final_color * alpha_3ch
+            transmittance *= inv_alpha
+
+        result = image.astype(np.float32) / 255.0
+        result = result * transmittance + layer
+
+        return (np.clip(result, 0, 1) * 255).astype(np.uint8)
+
+    def _shade_nail(
+        self,
+        geometry: NailGeometry,
+        material: NailMaterial,
+        image_shape: Tuple[int, int]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Compute a nail's shaded color and its alpha.
+
+        Returns:
+            (final_color, alpha_3ch), both (H, W, 3) float32 in [0, 1]
+        """
+        h, w = image_shape
 
         # Get mask region
         mask = geometry.mask
         if mask.shape != (h, w):
             mask = cv2.resize(mask, (w, h), interpolation=cv2.INTER_LINEAR)
 
-        # LAYER 1: Base Color
-        base_layer = self._render_base_color(mask, material, (h, w))
+        # LAYER 1: Base Color (already in linear space)
+        linear_base = self._render_base_color(mask, material, (h, w))
 
         # LAYER 2: Curvature Shading (makes it look 3D)
         shading_layer = self._render_curvature_shading(geometry, material, (h, w))
@@ -96,7 +254,6 @@ class PhotoRealisticNailRenderer:
 
         # COMPOSITE ALL LAYERS
         # Work in linear color space for physically accurate blending
-        linear_base = self._srgb_to_linear(base_layer)
 
         # Apply shading (multiply)
         shaded = linear_base * shading_layer
@@ -127,15 +284,7 @@ class PhotoRealisticNailRenderer:
         # Apply material opacity
         alpha_3ch = alpha_3ch * material.opacity
 
-        # FINAL COMPOSITE
-        # Blend nail color with original image
-        result = result.astype(np.float32) / 255.0
-        result = result * (1 - alpha_3ch) + final_color * alpha_3ch
-
-        # Convert back to uint8
-        result = (np.clip(result, 0, 1) * 255).astype(np.uint8)
-
-        return result
+        return final_color, alpha_3ch
 
     def _render_base_color(
         self,
@@ -143,19 +292,14 @@ class PhotoRealisticNailRenderer:
         material: NailMaterial,
         image_shape: Tuple[int, int]
     ) -> np.ndarray:
-        """Render the base color layer"""
-        h, w = image_shape
-        base = np.zeros((h, w, 3), dtype=np.float32)
-
-        # Fill with base color (BGR format for OpenCV)
-        r, g, b = material.base_color
-        base[:, :] = [b, g, r]  # Convert RGB to BGR
+        """Render the base color layer in linear color space"""
+        # The mask is binary, so linearizing the color first is exact
+        linear_base = self._material_shading(material).linear_base
 
         # Mask out non-nail regions
-        mask_3ch = np.stack([mask] * 3, axis=2)
-        base = base * mask_3ch
+        mask_3ch = np.stack([mask] * 3, axis=2).astype(np.float32)
 
-        return base
+        return mask_3ch * linear_base
 
     def _render_curvature_shading(
         self,
@@ -177,17 +321,11 @@ class PhotoRealisticNailRenderer:
         # Center of nail is brightest, edges are darker
         # This simulates the curved surface catching light
 
-        # Apply non-linear mapping for more pronounced effect
-        # Higher glossiness = more pronounced shading
-        shading_strength = 0.3 + material.glossiness * 0.5
-
-        # Gamma correction for shading curve
-        gamma = 1.5 - material.roughness * 0.5
-        shading = np.power(curvature, gamma)
-
-        # Map to lighting range (not completely black at edges)
-        min_light = 1.0 - shading_strength
-        shading = min_light + shading * shading_strength
+        # Non-linear mapping into the lighting range (not completely black
+        # at edges); higher glossiness = more pronounced shading.
+        # Precomputed per material as a lookup table.
+        shading_lut = self._material_shading(material).shading_lut
+        shading = shading_lut[self._lut_index(curvature)]
 
         # Expand to 3 channels
         shading_3ch = np.stack([shading] * 3, axis=2)
@@ -232,13 +370,10 @@ class PhotoRealisticNailRenderer:
         n_dot_h = np.sum(normals * halfway_reshaped, axis=2)
         n_dot_h = np.clip(n_dot_h, 0, 1)
 
-        # Specular power (shininess)
+        # Specular power (shininess) and intensity, precomputed per material
         # Glossier materials have sharper, brighter highlights
-        shininess = 10 + material.glossiness * 200
-        specular = np.power(n_dot_h, shininess)
-
-        # Apply intensity
-        specular = specular * material.specular_intensity
+        material_shading = self._material_shading(material)
+        specular = material_shading.specular_lut[self._lut_index(n_dot_h)]
 
         # Apply mask
         mask = geometry.mask
@@ -247,18 +382,8 @@ class PhotoRealisticNailRenderer:
 
         specular = specular * mask
 
-        # Color the highlight
-        r, g, b = material.specular_tint
-        highlights[:, :, 0] = specular * b  # B
-        highlights[:, :, 1] = specular * g  # G
-        highlights[:, :, 2] = specular * r  # R
-
-        # For metallic materials, tint highlight with base color
-        if material.metallic > 0.5:
-            base_r, base_g, base_b = material.base_color
-            highlights[:, :, 0] = highlights[:, :, 0] * (1 - material.metallic) + highlights[:, :, 0] * base_b * material.metallic
-            highlights[:, :, 1] = highlights[:, :, 1] * (1 - material.metallic) + highlights[:, :, 1] * base_g * material.metallic
-            highlights[:, :, 2] = highlights[:, :, 2] * (1 - material.metallic) + highlights[:, :, 2] * base_r * material.metallic
+        # Color the highlight (metallic materials are tinted with base color)
+        np.multiply(specular[:, :, None], material_shading.specular_color, out=highlights)
 
         return highlights
 
@@ -470,10 +595,4 @@ class PhotoRealisticNailRenderer:
         Returns:
             Image with all nails rendered
         """
-        result = image.copy()
-
-        # Render each nail
-        for geometry, material in zip(geometries, materials):
-            result = self.render_nail(result, geometry, material)
-
-        return result
+        return self._composite_nails(image, list(zip(geometries, materials)))
@@ -20,6 +20,7 @@ print("TEST 1: Importing modules...")
 try:
     from professional_nail_renderer import (
         NailGeometryAnalyzer,
+        analyze_all_nails,
         NailMaterial,
         MaterialPresets,
         MaterialFinish,
@@ -70,6 +71,57 @@ except Exception as e:
     traceback.print_exc()
     sys.exit(1)
 
+# Test 3b: Orientation regression on axis-aligned masks
+print("TEST 3b: Checking orientation on axis-aligned masks...")
+try:
+    # (mask kind, (width, height)) -> expected angle in [0, 180) and
+    # highlight point on a 320x240 frame
+    expected = [
+        ("ellipse", (25, 60), 0.0, (166, 113)),
+        ("ellipse", (30, 80), 0.0, (168, 111)),
+        ("ellipse", (80, 30), 90.0, (168, 128)),
+        ("rect", (30, 80), 0.0, (122, 90)),
+        ("rect", (80, 30), 0.0, (147, 65)),
+    ]
+    for kind, (mw, mh), angle, highlight in expected:
+        test_mask = np.zeros((240, 320), dtype=np.uint8)
+        if kind == "ellipse":
+            cv2.ellipse(test_mask, (160, 120), (mw // 2, mh // 2), 0, 0, 360, 1, -1)
+        else:
+            test_mask[60:60 + mh, 100:100 + mw] = 1
+
+        geom = analyzer.analyze(test_mask, min_area=100)
+        hx, hy = geom.highlight_point
+        if not 0 <= geom.orientation_angle < 180 or \
+                abs(geom.orientation_angle - angle) > 0.5 or \
+                abs(hx - highlight[0]) > 2 or abs(hy - highlight[1]) > 2:
+            print(f"❌ {kind} {mw}x{mh}: angle {geom.orientation_angle:.2f}°, "
+                  f"highlight {geom.highlight_point} (expected {angle}°, {highlight})\n")
+            sys.exit(1)
+
+    print(f"✅ Orientation matches on {len(expected)} axis-aligned masks\n")
+except Exception as e:
+    print(f"❌ Orientation regression failed: {e}\n")
+    sys.exit(1)
+
+# Test 3c: Batch analysis
+print("TEST 3c: Testing batch analysis...")
+try:
+    batch = analyze_all_nails(np.stack([mask, np.zeros_like(mask)]), min_area=100)
+    if sorted(batch) != [0]:
+        print(f"❌ Expected nail 0 only, got {sorted(batch)}\n")
+        sys.exit(1)
+
+    empty = analyze_all_nails(np.zeros((0, h, w), dtype=np.uint8))
+    if empty != {}:
+        print(f"❌ Empty mask stack returned {empty}\n")
+        sys.exit(1)
+
+    print("✅ Batch analysis handles empty and non-empty mask stacks\n")
+except Exception as e:
+    print(f"❌ Batch analysis failed: {e}\n")
+    sys.exit(1)
+
 # Test 4: Material presets
 print("TEST 4: Testing material presets...")
 try: